@@ -0,0 +1,174 @@
+"""Offline throughput benchmark for the sequential, threaded and async engines.
+
+Generates N synthetic brokers shaped like the shipped configs, serves them
+from a local HTTP server and runs main.py against them once per engine and
+parallelism level, reporting brokers/minute, peak RSS and CPU time.
+
+    python bench/run.py --brokers 20 --parallel 1,4,8 --latency 0.2
+"""
+
+import copy
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlparse
+
+import click
+import yaml
+
+from server import SHAPES, start_server
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Measure memory the same way the run's resource governor does
+sys.path.insert(0, ROOT)
+from governor import tree_rss  # noqa: E402
+
+# Shipped configs the synthetic brokers are modelled on
+TEMPLATES = {
+    "acme": "acme_example_plugin.yaml",
+    "infotracer": "infotracer.yaml",
+    "propertyrecs": "propertyrecs.yaml",
+    "unitedstatesphonebook": "unitedstatesphonebook.yaml",
+}
+
+IDENTITY = [
+    "--first", "Jane",
+    "--last", "Doe",
+    "--email", "jane@example.com",
+    "--phone", "5551234567",
+    "--city", "Springfield",
+    "--state", "Texas",
+    "--zip", "12345",
+]
+
+
+def generate_configs(target_dir, count, base_url):
+    """Write count broker configs pointing at the local stand-in sites"""
+    templates = {}
+    for shape, filename in TEMPLATES.items():
+        with open(os.path.join(ROOT, "brokers", filename), "r") as f:
+            templates[shape] = yaml.safe_load(f)
+
+    shapes = list(SHAPES)
+    for index in range(count):
+        shape = shapes[index % len(shapes)]
+        config = copy.deepcopy(templates[shape])
+        prefix = f"{base_url}/{shape}/{index}"
+        config["name"] = f"Bench {config['name']} #{index}"
+        config["slug"] = f"bench_{shape}_{index}"
+        config["url"] = f"{prefix}/"
+        for step in config["steps"]:
+            if step["action"] == "navigate":
+                step["url"] = prefix + urlparse(step["url"]).path
+        with open(os.path.join(target_dir, f"{config['slug']}.yaml"), "w") as f:
+            yaml.safe_dump(config, f, sort_keys=False)
+
+
+def run_once(broker_dir, engine, parallel, browsers):
+    """Run main.py once and measure wall time, peak RSS and CPU time"""
+    command = [
+        sys.executable,
+        os.path.join(ROOT, "main.py"),
+        *IDENTITY,
+        "--brokers-dir", broker_dir,
+        "--engine", engine,
+        "--parallel", str(parallel),
+        "--browsers", str(browsers),
+        "--headless",
+        "--auto-answer",
+        "--no-daemon",
+        "--telemetry", "",
+    ]
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # Output goes to a file rather than a pipe, which would fill up and
+    # stall the child while we are only polling it
+    with tempfile.TemporaryFile("w+") as log:
+        start = time.monotonic()
+        process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, text=True)
+
+        peak = 0
+        can_sample = os.path.isdir("/proc")
+        while process.poll() is None:
+            if can_sample:
+                peak = max(peak, tree_rss(process.pid))
+            time.sleep(0.1)
+        elapsed = time.monotonic() - start
+        log.seek(0)
+        output = log.read()
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    if not can_sample:
+        # Largest single descendant only, in KiB on Linux and bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        peak = after.ru_maxrss * scale
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    return {
+        "engine": engine,
+        "parallel": parallel,
+        "seconds": round(elapsed, 2),
+        "completed": output.count("✓ Completed"),
+        "peak_rss_mb": round(peak / 2**20, 1),
+        "cpu_seconds": round(cpu, 2),
+        "exit_code": process.returncode,
+        "output": output,
+    }
+
+
+@click.command(help="Benchmark Privotron engines against local stand-in broker sites")
+@click.option("--brokers", default=20, type=int, help="Number of synthetic brokers (default: 20)")
+@click.option("--parallel", default="1,4,8", help="Comma separated parallelism levels (default: 1,4,8)")
+@click.option("--engines", default="thread,async", help="Comma separated engines (default: thread,async)")
+@click.option("--browsers", default=1, type=int, help="Browser pool size for every run (default: 1)")
+@click.option("--latency", default=0.1, type=float, help="Server delay per request in seconds (default: 0.1)")
+@click.option("--json", "json_path", default=None, help="Also write the results to this JSON file")
+def benchmark(brokers, parallel, engines, browsers, latency, json_path):
+    server = start_server(latency=latency)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    levels = [int(level) for level in parallel.split(",")]
+    results = []
+
+    with tempfile.TemporaryDirectory() as broker_dir:
+        generate_configs(broker_dir, brokers, base_url)
+        print(f"Serving {brokers} stand-in brokers at {base_url} ({latency}s latency)")
+
+        for engine in engines.split(","):
+            for level in levels:
+                # The thread engine at parallel 1 is the sequential path
+                label = "sequential" if engine == "thread" and level == 1 else engine
+                print(f"Running {label} with parallel {level}...")
+                result = run_once(broker_dir, engine, level, browsers)
+                result["label"] = label
+                results.append(result)
+                if result["exit_code"] != 0 or result["completed"] < brokers:
+                    print(f"Warning: {result['completed']}/{brokers} brokers completed")
+                    print(result["output"][-2000:])
+
+    server.shutdown()
+
+    print(f"\n{'engine':<12} {'parallel':>8} {'done':>6} {'seconds':>9} {'brokers/min':>12} {'peak RSS MB':>12} {'CPU s':>8}")
+    for result in results:
+        rate = result["completed"] / result["seconds"] * 60 if result["seconds"] else 0
+        result["brokers_per_minute"] = round(rate, 1)
+        print(
+            f"{result['label']:<12} {result['parallel']:>8} {result['completed']:>6} "
+            f"{result['seconds']:>9.2f} {rate:>12.1f} {result['peak_rss_mb']:>12.1f} "
+            f"{result['cpu_seconds']:>8.2f}"
+        )
+
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(
+                [{k: v for k, v in r.items() if k != "output"} for r in results],
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,138 @@
+"""Local stand-in broker sites for offline benchmarks.
+
+Every synthetic broker lives under /<shape>/<id>/ where shape is one of the
+shipped broker configs. The pages contain exactly the selectors those configs
+use, so the real step interpreter can run against them unchanged.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+STATES = ["AL", "AK", "AZ", "CA", "CO", "NY", "TX", "WA"]
+
+PAGE = """<!doctype html>
+<html><head><title>{title}</title><style>body{{font-family:sans-serif}}</style></head>
+<body><h1>{title}</h1>{body}</body></html>"""
+
+RESULTS = """<table class="table table-bordered table-hover">
+<tr class="record-result"><td>Jane Doe</td><td>Springfield</td><td><input type="checkbox"></td></tr>
+<tr class="record-result"><td>Jane A. Doe</td><td>Shelbyville</td><td><input type="checkbox"></td></tr>
+</table>"""
+
+INFOTRACER_ID = "InfoPay_Core_Components_OptOuts_DataRemovalServiceModel"
+
+
+def _acme(rest):
+    if rest == "optout":
+        # The search posts to an API and renders results in place, like most brokers
+        return PAGE.format(
+            title="Acme opt-out",
+            body="""
+<input id="firstName"><input id="lastName"><input id="email"><input id="zip">
+<button id="searchButton" onclick="search()">Search</button>
+<div id="results"></div>
+<script>
+function search() {
+  fetch("api/search").then(r => r.json()).then(d => {
+    document.getElementById("results").innerHTML = d.html +
+      '<button id="submitOptOut" onclick="location.href=\\'done\\'">Opt out</button>';
+  });
+}
+</script>""",
+        )
+    if rest == "api/search":
+        return {"html": RESULTS}
+    return PAGE.format(title="Acme done", body="<p>Request received</p>")
+
+
+def _infotracer(rest):
+    if rest == "optout/":
+        options = "".join(f'<option value="{s}">{s}</option>' for s in STATES)
+        return PAGE.format(
+            title="InfoTracer opt-out",
+            body=f"""
+<form action="verify">
+<input id="{INFOTRACER_ID}_fname" name="fname">
+<input id="{INFOTRACER_ID}_lname" name="lname">
+<select id="{INFOTRACER_ID}_state" name="state">{options}</select>
+<input id="{INFOTRACER_ID}_city" name="city">
+<button class="form-btn" type="submit">Search</button>
+</form>""",
+        )
+    if rest == "optout/verify":
+        return PAGE.format(
+            title="InfoTracer verification",
+            body='<button id="notrobl" onclick="location.href=\'results\'">I am not a robot</button>',
+        )
+    return PAGE.format(title="InfoTracer results", body=RESULTS)
+
+
+def _propertyrecs(rest):
+    if rest == "opt-out":
+        return PAGE.format(
+            title="Property Recs opt-out",
+            body="""
+<form action="results">
+<input name="name"><input name="cityState">
+<button type="submit">Search</button>
+</form>""",
+        )
+    return PAGE.format(title="Property Recs results", body=RESULTS)
+
+
+def _unitedstatesphonebook(rest):
+    if rest == "contact.php":
+        return PAGE.format(
+            title="United States Phonebook",
+            body="""
+<form action="removed.php">
+<input name="number"><input name="zip">
+<input type="submit" value="Request Removal">
+</form>""",
+        )
+    return PAGE.format(title="United States Phonebook", body="<p>Number removed</p>")
+
+
+SHAPES = {
+    "acme": _acme,
+    "infotracer": _infotracer,
+    "propertyrecs": _propertyrecs,
+    "unitedstatesphonebook": _unitedstatesphonebook,
+}
+
+
+class BrokerSiteHandler(BaseHTTPRequestHandler):
+    """Serve the synthetic pages, delaying every response by server.latency"""
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        parts = self.path.split("?", 1)[0].lstrip("/").split("/", 2)
+        if len(parts) < 3 or parts[0] not in SHAPES:
+            self.send_error(404)
+            return
+
+        page = SHAPES[parts[0]](parts[2])
+        if isinstance(page, dict):
+            payload, content_type = json.dumps(page).encode(), "application/json"
+        else:
+            payload, content_type = page.encode(), "text/html; charset=utf-8"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(latency=0.0, port=0):
+    """Start the stand-in sites on a background thread and return the server"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), BrokerSiteHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
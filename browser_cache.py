@@ -0,0 +1,213 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from resources import broker_site
+
+
+# Static resources worth keeping between runs
+CACHEABLE_TYPES = {"stylesheet", "script", "image", "font", "media"}
+
+# Freshness for responses that don't say how long they may be cached
+DEFAULT_MAX_AGE = 24 * 3600
+
+# Headers that describe the transfer rather than the body we replay
+HOP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+# Headers that belong to the session that fetched a response, never replayed
+# to another context: cookies would leak between profiles
+SESSION_HEADERS = {"set-cookie"}
+
+
+def _replayable(headers):
+    """Headers of a stored response that are safe to serve to any context"""
+    return {
+        k: v
+        for k, v in headers.items()
+        if k.lower() not in HOP_HEADERS and k.lower() not in SESSION_HEADERS
+    }
+
+
+def _write_atomic(path, data):
+    temp_path = f"{path}.tmp.{threading.get_ident()}"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+class StorageStates:
+    """Cookies and localStorage kept per broker site between runs.
+
+    A broker's context starts from the state its site left behind last time,
+    so consent banners and bot checks that were already passed stay passed.
+    With `per_profile` every profile gets its own state per site, so sites
+    can't link the identities through their cookies.
+    """
+
+    def __init__(self, root, per_profile=False):
+        self.root = root
+        self.per_profile = per_profile
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, job):
+        site = broker_site(job["config"]) or job["config"]["slug"]
+        if not self.per_profile:
+            return os.path.join(self.root, f"{site}.json")
+        directory = os.path.join(self.root, job.get("profile") or "default")
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f"{site}.json")
+
+    def context_options(self, job):
+        """Keyword arguments for new_context that restore the job's saved state"""
+        path = self.path(job)
+        return {"storage_state": path} if os.path.exists(path) else {}
+
+    def save(self, context, job):
+        """Save a context's state once its broker has finished"""
+        try:
+            state = context.storage_state()
+            _write_atomic(self.path(job), json.dumps(state).encode())
+        except Exception as e:
+            print(f"Warning: Could not save browser state for {job['label']}: {e}")
+
+    async def save_async(self, context, job):
+        try:
+            state = await context.storage_state()
+            _write_atomic(self.path(job), json.dumps(state).encode())
+        except Exception as e:
+            print(f"Warning: Could not save browser state for {job['label']}: {e}")
+
+
+class HttpCache:
+    """On-disk cache of static broker assets shared by every context.
+
+    Browser contexts start with an empty in-memory cache, so without this
+    every broker run downloads the same scripts, stylesheets and fonts again.
+    GET requests for cacheable resource types are answered from disk while
+    fresh; everything else goes to the network. When the cache grows past
+    `max_bytes` the least recently used entries are evicted.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._size = sum(
+            entry.stat().st_size for entry in os.scandir(root) if entry.is_file()
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode()).hexdigest()
+        return os.path.join(self.root, f"{key}.json"), os.path.join(self.root, f"{key}.body")
+
+    def handles(self, request):
+        return request.method == "GET" and request.resource_type in CACHEABLE_TYPES
+
+    def lookup(self, url):
+        """Fresh (meta, body) for a URL, or None"""
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            if meta["expires"] < time.time():
+                return None
+            with open(body_path, "rb") as f:
+                body = f.read()
+            # Reads refresh the entry's place in the eviction order
+            os.utime(body_path)
+        except (OSError, ValueError, KeyError):
+            return None
+        return meta, body
+
+    def store(self, url, status, headers, body):
+        """Keep a response if it is cacheable, evicting old entries if needed"""
+        control = headers.get("cache-control", "").lower()
+        if status != 200 or "no-store" in control or "private" in control:
+            return
+        match = re.search(r"max-age=(\d+)", control)
+        max_age = int(match.group(1)) if match else DEFAULT_MAX_AGE
+        if max_age <= 0 or len(body) > self.max_bytes:
+            return
+
+        meta = {
+            "url": url,
+            "status": status,
+            "headers": _replayable(headers),
+            "expires": time.time() + max_age,
+        }
+        meta_path, body_path = self._paths(url)
+        with self._lock:
+            previous = sum(
+                os.path.getsize(path) for path in (meta_path, body_path) if os.path.exists(path)
+            )
+            encoded = json.dumps(meta).encode()
+            _write_atomic(body_path, body)
+            _write_atomic(meta_path, encoded)
+            self._size += len(body) + len(encoded) - previous
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Drop least recently used bodies until the cache is at 90% of its budget
+        bodies = sorted(
+            (entry for entry in os.scandir(self.root) if entry.name.endswith(".body")),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in bodies:
+            if self._size <= self.max_bytes * 0.9:
+                break
+            meta_path = entry.path[: -len(".body")] + ".json"
+            for path in (entry.path, meta_path):
+                try:
+                    self._size -= os.path.getsize(path)
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def serve(self, route):
+        """Answer a routed request from the cache, or fetch and remember it"""
+        url = route.request.url
+        hit = self.lookup(url)
+        if hit:
+            self.hits += 1
+            meta, body = hit
+            route.fulfill(status=meta["status"], headers=_replayable(meta["headers"]), body=body)
+            return
+        self.misses += 1
+        try:
+            response = route.fetch()
+            body = response.body()
+        except Exception:
+            route.continue_()
+            return
+        self.store(url, response.status, response.headers, body)
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in HOP_HEADERS}
+        route.fulfill(status=response.status, headers=headers, body=body)
+
+    async def serve_async(self, route):
+        """Async counterpart of serve"""
+        url = route.request.url
+        hit = self.lookup(url)
+        if hit:
+            self.hits += 1
+            meta, body = hit
+            await route.fulfill(
+                status=meta["status"], headers=_replayable(meta["headers"]), body=body
+            )
+            return
+        self.misses += 1
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except Exception:
+            await route.continue_()
+            return
+        self.store(url, response.status, response.headers, body)
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in HOP_HEADERS}
+        await route.fulfill(status=response.status, headers=headers, body=body)
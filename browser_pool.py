@@ -0,0 +1,345 @@
+import asyncio
+import socket
+import threading
+from contextlib import asynccontextmanager, contextmanager
+
+from governor import BROWSER_MARKER
+
+
+def _free_port():
+    """Ask the OS for a free localhost port for a Chromium debugging endpoint"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _close_browser(entry):
+    try:
+        entry["browser"].close()
+    except Exception as e:
+        print(f"Warning: Could not close pooled browser: {e}")
+
+
+async def _close_browser_async(entry):
+    try:
+        await entry["browser"].close()
+    except Exception as e:
+        print(f"Warning: Could not close pooled browser: {e}")
+
+
+def _due_for_replacement(entry, browsers):
+    """True for a retired browser that is idle or the last one left in its mode"""
+    if not entry["retire"]:
+        return False
+    if not entry["leases"]:
+        return True
+    return all(b["retire"] for b in browsers if b["headless"] == entry["headless"])
+
+
+class BrowserPool:
+    """A fixed number of long-lived Chromium instances shared by broker runs.
+
+    Every broker run gets its own isolated browser context which is closed as
+    soon as the run finishes, so cookies and storage never leak between
+    brokers. Sync Playwright objects can only be used from the thread that
+    created them, so worker threads attach to the pooled browsers over CDP
+    with a driver of their own instead of launching Chromium per broker.
+
+    `modes` lists the headless settings to launch browsers for; each one gets
+    `size` browsers so headless and headed brokers can share a run.
+
+    Browsers can be recycled to shed memory heavy pages leave behind: a
+    browser marked for retirement gets no new contexts and is replaced by
+    maintain() once its last one closes. When it is the last browser in its
+    mode, maintain() launches the replacement straight away instead, and
+    workers wait for that rather than opening contexts on the old one.
+    """
+
+    def __init__(self, size=1, modes=(False,)):
+        self.size = max(1, size)
+        self.modes = set(modes)
+        self._lock = threading.Lock()
+        self._replaced = threading.Condition(self._lock)
+        self._local = threading.local()
+        self._playwright = None
+        self._owner = None
+        self._browsers = []
+        self._draining = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def start(self):
+        """Launch the pooled browsers from the calling thread"""
+        # Playwright is imported on first use so startup stays fast without a browser
+        from playwright.sync_api import sync_playwright
+
+        self._playwright = sync_playwright().start()
+        self._owner = threading.get_ident()
+        for headless in sorted(self.modes):
+            for _ in range(self.size):
+                entry = {"index": len(self._browsers), "headless": headless, "generation": 0}
+                self._launch(entry)
+                self._browsers.append(entry)
+        print(f"Started browser pool with {len(self._browsers)} Chromium instance(s)")
+        return self
+
+    def _launch(self, entry):
+        port = _free_port()
+        entry["marker"] = f"{entry['index']}.{entry['generation']}"
+        entry["browser"] = self._playwright.chromium.launch(
+            headless=entry["headless"],
+            args=[f"--remote-debugging-port={port}", BROWSER_MARKER + entry["marker"]],
+        )
+        entry.update(endpoint=f"http://127.0.0.1:{port}", leases=0, jobs=0, retire=False)
+
+    def maintain(self, recycle_after=0, recycle_bytes=0, governor=None):
+        """Retire browsers past their job or memory limit and replace retired ones.
+
+        Launching needs the starting thread's driver, so only call this from there.
+        """
+        # Holding the lock while relaunching keeps a closing browser from
+        # being handed out; workers just wait the moment it takes
+        with self._lock:
+            for entry in self._browsers:
+                if (recycle_after and entry["jobs"] >= recycle_after) or (
+                    recycle_bytes and governor and governor.browser_rss(entry["marker"]) > recycle_bytes
+                ):
+                    entry["retire"] = True
+            self._recycle()
+
+    def _recycle(self):
+        # Called with the lock held, from the starting thread
+        for position, entry in enumerate(self._browsers):
+            if _due_for_replacement(entry, self._browsers):
+                self._browsers[position] = self._replace(entry)
+        for entry in list(self._draining):
+            if not entry["leases"]:
+                self._draining.remove(entry)
+                _close_browser(entry)
+        self._replaced.notify_all()
+
+    def _replace(self, entry):
+        replacement = {
+            "index": entry["index"],
+            "headless": entry["headless"],
+            "generation": entry["generation"] + 1,
+        }
+        if entry["leases"]:
+            # Contexts are still open on it; close it once they are done
+            self._draining.append(entry)
+        else:
+            _close_browser(entry)
+        self._launch(replacement)
+        print(f"Recycled browser {entry['index']} after {entry['jobs']} brokers")
+        return replacement
+
+    def close(self):
+        """Close the pooled browsers. Must be called from the starting thread."""
+        for entry in self._browsers + self._draining:
+            _close_browser(entry)
+        self._browsers = []
+        self._draining = []
+        if self._playwright:
+            self._playwright.stop()
+            self._playwright = None
+
+    def is_connected(self):
+        """True while every pooled browser is still running"""
+        return all(entry["browser"].is_connected() for entry in self._browsers)
+
+    def release_thread(self):
+        """Detach the calling worker thread from the pool and stop its driver"""
+        for browser in getattr(self._local, "browsers", {}).values():
+            try:
+                # For CDP connections this only disconnects, the browser keeps running
+                browser.close()
+            except Exception:
+                pass
+        self._local.browsers = {}
+        driver = getattr(self._local, "playwright", None)
+        if driver is not None:
+            driver.stop()
+            self._local.playwright = None
+
+    def _acquire(self, headless):
+        # Hand out the browser in the requested mode with the fewest open
+        # contexts that isn't waiting to be recycled
+        with self._lock:
+            while True:
+                candidates = [
+                    b for b in self._browsers if b["headless"] == headless and not b["retire"]
+                ]
+                if candidates:
+                    break
+                if threading.get_ident() == self._owner:
+                    # The starting thread can't wait on itself to replace it
+                    self._recycle()
+                else:
+                    self._replaced.wait()
+            entry = min(candidates, key=lambda b: b["leases"])
+            entry["leases"] += 1
+            return entry
+
+    def _release(self, entry):
+        with self._lock:
+            entry["leases"] -= 1
+            entry["jobs"] += 1
+
+    def _browser_for(self, entry):
+        if threading.get_ident() == self._owner:
+            return entry["browser"]
+
+        attached = getattr(self._local, "browsers", None)
+        if attached is None:
+            attached = self._local.browsers = {}
+        # Keyed by endpoint, since a recycled browser comes back on a new one
+        if entry["endpoint"] not in attached:
+            # Let go of connections to browsers that have been recycled since
+            with self._lock:
+                live = {b["endpoint"] for b in self._browsers + self._draining}
+            for endpoint in list(attached):
+                if endpoint not in live:
+                    try:
+                        attached.pop(endpoint).close()
+                    except Exception:
+                        pass
+            driver = getattr(self._local, "playwright", None)
+            if driver is None:
+                from playwright.sync_api import sync_playwright
+
+                driver = self._local.playwright = sync_playwright().start()
+            attached[entry["endpoint"]] = driver.chromium.connect_over_cdp(
+                entry["endpoint"]
+            )
+        return attached[entry["endpoint"]]
+
+    @contextmanager
+    def context(self, headless=False, **options):
+        """Yield a fresh browser context that is torn down afterwards"""
+        entry = self._acquire(headless)
+        try:
+            context = self._browser_for(entry).new_context(**options)
+            try:
+                yield context
+            finally:
+                context.close()
+        finally:
+            self._release(entry)
+
+
+class AsyncBrowserPool:
+    """Async counterpart of BrowserPool driven by a single async_playwright driver.
+
+    All browsers and contexts live on the one event loop, so pages for many
+    brokers can be driven concurrently without a driver per worker. Browsers
+    are recycled the same way as in BrowserPool.
+    """
+
+    def __init__(self, size=1, modes=(False,)):
+        self.size = max(1, size)
+        self.modes = set(modes)
+        self._playwright = None
+        self._browsers = []
+        self._draining = []
+        self._maintaining = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def start(self):
+        """Start the driver and launch the pooled browsers"""
+        from playwright.async_api import async_playwright
+
+        self._playwright = await async_playwright().start()
+        self._maintaining = asyncio.Lock()
+        for headless in sorted(self.modes):
+            for _ in range(self.size):
+                entry = {"index": len(self._browsers), "headless": headless, "generation": 0}
+                await self._launch(entry)
+                self._browsers.append(entry)
+        print(f"Started browser pool with {len(self._browsers)} Chromium instance(s)")
+        return self
+
+    async def _launch(self, entry):
+        entry["marker"] = f"{entry['index']}.{entry['generation']}"
+        entry["browser"] = await self._playwright.chromium.launch(
+            headless=entry["headless"], args=[BROWSER_MARKER + entry["marker"]]
+        )
+        entry.update(leases=0, jobs=0, retire=False)
+
+    async def maintain(self, recycle_after=0, recycle_bytes=0, governor=None):
+        """Async counterpart of BrowserPool.maintain"""
+        for entry in self._browsers:
+            if (recycle_after and entry["jobs"] >= recycle_after) or (
+                recycle_bytes and governor and governor.browser_rss(entry["marker"]) > recycle_bytes
+            ):
+                entry["retire"] = True
+        # Tasks finishing together must not replace the same browser twice
+        async with self._maintaining:
+            for position, entry in enumerate(self._browsers):
+                if _due_for_replacement(entry, self._browsers):
+                    self._browsers[position] = await self._replace(entry)
+            for entry in list(self._draining):
+                if not entry["leases"]:
+                    self._draining.remove(entry)
+                    await _close_browser_async(entry)
+
+    async def _replace(self, entry):
+        replacement = {
+            "index": entry["index"],
+            "headless": entry["headless"],
+            "generation": entry["generation"] + 1,
+        }
+        # Retired entries get no new contexts, so it can't gain any meanwhile
+        if entry["leases"]:
+            self._draining.append(entry)
+        else:
+            await _close_browser_async(entry)
+        await self._launch(replacement)
+        print(f"Recycled browser {entry['index']} after {entry['jobs']} brokers")
+        return replacement
+
+    def is_connected(self):
+        """True while every pooled browser is still running"""
+        return all(entry["browser"].is_connected() for entry in self._browsers)
+
+    async def close(self):
+        """Close the pooled browsers and stop the driver"""
+        for entry in self._browsers + self._draining:
+            await _close_browser_async(entry)
+        self._browsers = []
+        self._draining = []
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+
+    @asynccontextmanager
+    async def context(self, headless=False, **options):
+        """Yield a fresh browser context that is torn down afterwards"""
+        # Everything runs on one loop, so no lock is needed around the leases
+        while True:
+            candidates = [
+                b for b in self._browsers if b["headless"] == headless and not b["retire"]
+            ]
+            if candidates:
+                break
+            # Every browser in this mode is retired; any task may launch here
+            await self.maintain()
+        entry = min(candidates, key=lambda b: b["leases"])
+        entry["leases"] += 1
+        try:
+            context = await entry["browser"].new_context(**options)
+            try:
+                yield context
+            finally:
+                await context.close()
+        finally:
+            entry["leases"] -= 1
+            entry["jobs"] += 1
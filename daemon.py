@@ -0,0 +1,426 @@
+import asyncio
+import contextlib
+import http.client
+import itertools
+import json
+import os
+import queue
+import secrets
+import sys
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import click
+
+from browser_pool import AsyncBrowserPool, BrowserPool
+from prompts import ask_console
+
+
+# Finished jobs kept around for their status and events
+KEEP_JOBS = 100
+
+
+def _dir_signature(broker_dir):
+    # Changes whenever a broker file is added, removed or edited
+    try:
+        entries = sorted(os.scandir(broker_dir), key=lambda entry: entry.name)
+    except OSError:
+        return None
+    return tuple(
+        (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size) for entry in entries
+    )
+
+
+class Job:
+    """One CLI invocation submitted to the daemon, with its progress events"""
+
+    def __init__(self, args, cwd):
+        self.id = uuid.uuid4().hex[:12]
+        self.args = args
+        self.cwd = cwd
+        self.status = "queued"
+        self.exit_code = None
+        self.events = []
+        self.detached = False
+        self._answers = {}
+        self._prompt_ids = itertools.count(1)
+        self._cond = threading.Condition()
+
+    def emit(self, event):
+        with self._cond:
+            self.events.append(event)
+            self._cond.notify_all()
+
+    def finish(self, exit_code):
+        self.exit_code = exit_code
+        self.status = "done" if exit_code == 0 else "failed"
+        self.emit({"type": "done", "exit_code": exit_code})
+
+    def answer_prompt(self, ticket):
+        """Forward a prompt ticket to the client and wait for its answer.
+
+        Raises EOFError if the client can't answer or has gone away, as
+        input() would on a closed console.
+        """
+        prompt_id = next(self._prompt_ids)
+        self.emit(
+            {
+                "type": "prompt",
+                "prompt": prompt_id,
+                "name": ticket.name,
+                "description": ticket.description,
+            }
+        )
+        with self._cond:
+            while prompt_id not in self._answers and not self.detached:
+                self._cond.wait()
+            answered = self._answers.pop(prompt_id, False)
+        if not answered:
+            raise EOFError
+
+    def answer(self, prompt_id, answered):
+        with self._cond:
+            self._answers[prompt_id] = answered
+            self._cond.notify_all()
+
+    def detach(self):
+        """The client stopped following, so nobody is left to answer prompts"""
+        with self._cond:
+            self.detached = True
+            self._cond.notify_all()
+
+    def follow(self):
+        """Yield every event, waiting for new ones until the job is finished"""
+        index = 0
+        while True:
+            with self._cond:
+                while index >= len(self.events):
+                    self._cond.wait()
+                batch = self.events[index:]
+                index = len(self.events)
+            yield from batch
+            if batch[-1]["type"] == "done":
+                return
+
+
+class JobOutput:
+    """Stand-in for sys.stdout that turns a job's printed lines into events.
+
+    Worker threads print concurrently, so partial lines are buffered per
+    thread. Everything is echoed to the daemon's own console as well.
+    """
+
+    def __init__(self, job, echo):
+        self.job = job
+        self.echo = echo
+        self._local = threading.local()
+
+    def _emit(self, line):
+        self.job.emit({"type": "output", "line": line})
+        self.echo.write(f"[{self.job.id}] {line}\n")
+
+    def write(self, text):
+        pending = getattr(self._local, "pending", "") + text
+        *lines, self._local.pending = pending.split("\n")
+        for line in lines:
+            self._emit(line)
+        return len(text)
+
+    def flush(self):
+        # input() flushes its prompt without a newline; pass it on as it is
+        pending = getattr(self._local, "pending", "")
+        if pending:
+            self._local.pending = ""
+            self._emit(pending)
+        self.echo.flush()
+
+
+class Warm:
+    """Broker registries and browser pools kept alive between daemon jobs.
+
+    The async engine's pool belongs to an event loop, so async jobs run on
+    one loop kept here instead of a fresh one per job. job is the job being
+    run, whose client answers its prompts.
+    """
+
+    def __init__(self):
+        self.job = None
+        self._registries = {}
+        self._pool = None
+        self._async_pool = None
+        self._loop = None
+
+    def registry(self, broker_dir, load):
+        """The registry for broker_dir, reloaded only when its files changed"""
+        key = os.path.abspath(broker_dir)
+        signature = _dir_signature(key)
+        cached = self._registries.get(key)
+        if cached is None or cached[0] != signature:
+            cached = self._registries[key] = (signature, load(broker_dir))
+        return cached[1]
+
+    @contextlib.contextmanager
+    def pool(self, size, modes):
+        """The resident browser pool, restarted if it can't serve this run"""
+        pool = self._pool
+        if (
+            pool is None
+            or pool.size != max(1, size)
+            or not set(modes) <= pool.modes
+            or not pool.is_connected()
+        ):
+            self.close()
+            self._pool = BrowserPool(size=size, modes=modes).start()
+        yield self._pool
+
+    def run(self, coroutine):
+        """Run an async engine job on the loop that owns the resident async pool"""
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(coroutine)
+
+    @contextlib.asynccontextmanager
+    async def async_pool(self, size, modes):
+        """The resident async browser pool, restarted if it can't serve this run"""
+        pool = self._async_pool
+        if (
+            pool is None
+            or pool.size != max(1, size)
+            or not set(modes) <= pool.modes
+            or not pool.is_connected()
+        ):
+            if pool:
+                self._async_pool = None
+                await pool.close()
+            self._async_pool = await AsyncBrowserPool(size=size, modes=modes).start()
+        yield self._async_pool
+
+    def close(self):
+        if self._pool:
+            self._pool.close()
+            self._pool = None
+        if self._async_pool:
+            self.run(self._async_pool.close())
+            self._async_pool = None
+        if self._loop:
+            self._loop.close()
+            self._loop = None
+
+
+class DaemonHandler(BaseHTTPRequestHandler):
+    """Local job API: POST /jobs, POST /jobs/<id>/prompts/<n>, GET /jobs/<id>
+    and GET /jobs/<id>/events"""
+
+    def _authorized(self):
+        if self.headers.get("Authorization") == f"Bearer {self.server.token}":
+            return True
+        self._json(401, {"error": "missing or wrong token"})
+        return False
+
+    def _json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        parts = self.path.strip("/").split("/")
+        if len(parts) == 4 and parts[0] == "jobs" and parts[2] == "prompts":
+            self._answer_prompt(parts[1], parts[3])
+            return
+        if self.path != "/jobs":
+            self._json(404, {"error": "not found"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            args = [str(arg) for arg in request["args"]]
+        except (ValueError, KeyError, TypeError):
+            self._json(400, {"error": "expected {\"args\": [...], \"cwd\": ...}"})
+            return
+        job = self.server.daemon.submit(args, request.get("cwd") or os.getcwd())
+        self._json(202, {"id": job.id})
+
+    def _answer_prompt(self, job_id, prompt_id):
+        job = self.server.daemon.jobs.get(job_id)
+        if job is None or not prompt_id.isdigit():
+            self._json(404, {"error": "no such prompt"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            answered = bool(request["answered"])
+        except (ValueError, KeyError, TypeError):
+            self._json(400, {"error": "expected {\"answered\": true|false}"})
+            return
+        job.answer(int(prompt_id), answered)
+        self._json(200, {"ok": True})
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        parts = self.path.strip("/").split("/")
+        job = None
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            job = self.server.daemon.jobs.get(parts[1])
+        if job is None or (len(parts) == 3 and parts[2] != "events"):
+            self._json(404, {"error": "no such job"})
+            return
+        if len(parts) == 2:
+            self._json(200, {"id": job.id, "status": job.status, "exit_code": job.exit_code})
+            return
+
+        # One JSON event per line, streamed until the job is done
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        try:
+            for event in job.follow():
+                self.wfile.write((json.dumps(event) + "\n").encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            job.detach()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Daemon:
+    """Run CLI invocations as jobs in one long-lived process.
+
+    The broker registry and the browser pools stay warm between jobs, so a
+    job only pays for its actual site interaction. Jobs run one at a time
+    on the thread that owns the pool; each can still be parallel itself.
+    The API listens on localhost only and requires the token written to
+    the state file, which only the current user can read.
+    """
+
+    def __init__(self, command, state_path, port=0):
+        self.command = command
+        self.state_path = state_path
+        self.port = port
+        self.warm = Warm()
+        self.jobs = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+
+    def submit(self, args, cwd):
+        job = Job(args, cwd)
+        with self._lock:
+            self.jobs[job.id] = job
+            finished = [j for j in self.jobs.values() if j.exit_code is not None]
+            for old in finished[: max(0, len(finished) - KEEP_JOBS)]:
+                del self.jobs[old.id]
+        self._queue.put(job)
+        return job
+
+    def _write_state(self, port, token):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        fd = os.open(self.state_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump({"pid": os.getpid(), "port": port, "token": token}, f)
+
+    def run(self):
+        server = ThreadingHTTPServer(("127.0.0.1", self.port), DaemonHandler)
+        server.daemon_threads = True
+        server.daemon = self
+        server.token = secrets.token_hex(16)
+        port = server.server_address[1]
+        self._write_state(port, server.token)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Privotron daemon listening on http://127.0.0.1:{port} (Ctrl-C to stop)")
+
+        try:
+            while True:
+                self._run(self._queue.get())
+        except KeyboardInterrupt:
+            print("\nStopping daemon")
+        finally:
+            server.shutdown()
+            self.warm.close()
+            with contextlib.suppress(OSError):
+                os.remove(self.state_path)
+
+    def _run(self, job):
+        job.status = "running"
+        stdout, cwd = sys.stdout, os.getcwd()
+        sys.stdout = JobOutput(job, stdout)
+        self.warm.job = job
+        exit_code = 0
+        try:
+            os.chdir(job.cwd)
+            self.command.main(
+                job.args, prog_name="main.py", standalone_mode=False, obj=self.warm
+            )
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except click.ClickException as e:
+            print(f"Error: {e.format_message()}")
+            exit_code = e.exit_code
+        except click.Abort:
+            exit_code = 1
+        except Exception as e:
+            print(f"Error: {e}")
+            exit_code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stdout = stdout
+            self.warm.job = None
+            os.chdir(cwd)
+        job.finish(exit_code)
+
+
+def submit_to_daemon(state_path, args):
+    """Run a CLI invocation on the running daemon and stream its output.
+
+    Record selection prompts are asked on this console and answered back to
+    the daemon. Returns the job's exit code, or None if no daemon is running.
+    """
+    try:
+        with open(state_path, "r") as f:
+            state = json.load(f)
+        connection = http.client.HTTPConnection("127.0.0.1", state["port"], timeout=5)
+        headers = {"Authorization": f"Bearer {state['token']}", "Content-Type": "application/json"}
+        connection.request(
+            "POST", "/jobs", body=json.dumps({"args": args, "cwd": os.getcwd()}), headers=headers
+        )
+        response = connection.getresponse()
+        payload = json.loads(response.read())
+    except (OSError, ValueError, KeyError):
+        # No daemon, or a stale state file left by one that died
+        return None
+    if response.status != 202:
+        print(f"Error: Daemon rejected the job: {payload.get('error')}")
+        return 1
+
+    job_id = payload["id"]
+    print(f"Submitted job {job_id} to the running daemon")
+    connection = http.client.HTTPConnection("127.0.0.1", state["port"])
+    connection.request("GET", f"/jobs/{job_id}/events", headers=headers)
+    for raw in connection.getresponse():
+        event = json.loads(raw)
+        if event["type"] == "output":
+            print(event["line"])
+        elif event["type"] == "prompt":
+            try:
+                ask_console(event["name"], event["description"])
+                answered = True
+            except EOFError:
+                print()
+                answered = False
+            answer = http.client.HTTPConnection("127.0.0.1", state["port"], timeout=5)
+            answer.request(
+                "POST",
+                f"/jobs/{job_id}/prompts/{event['prompt']}",
+                body=json.dumps({"answered": answered}),
+                headers=headers,
+            )
+            answer.getresponse().read()
+            answer.close()
+        elif event["type"] == "done":
+            return event["exit_code"]
+    print(f"Error: Lost the connection to the daemon while job {job_id} was running")
+    return 1
@@ -0,0 +1,106 @@
+# Steps that only put a value into a form control
+FORM_ACTIONS = {"fill", "fill_full_name", "select", "select_state"}
+
+# Sets every control it can and reports which ones it set. A control is
+# skipped, and left to the normal per-step path, when its selector isn't
+# plain CSS, it isn't attached, visible and enabled yet, or no option matches.
+BATCH_SCRIPT = """
+(fields) => fields.map((field) => {
+  let element;
+  try {
+    element = document.querySelector(field.selector);
+  } catch (e) {
+    return false;
+  }
+  if (!element || element.disabled || element.readOnly || !element.getClientRects().length) {
+    return false;
+  }
+  if (field.kind === "select") {
+    if (element.tagName !== "SELECT") return false;
+    const options = Array.from(element.options);
+    const option = "index" in field
+      ? options[field.index]
+      : options.find((o) => ("label" in field ? o.label === field.label
+                                              : o.value === field.value || o.label === field.value));
+    if (!option) return false;
+    element.value = option.value;
+  } else {
+    const proto = element.tagName === "TEXTAREA" ? HTMLTextAreaElement.prototype
+                : element.tagName === "INPUT" ? HTMLInputElement.prototype : null;
+    if (!proto) return false;
+    // Go through the native setter so framework-managed inputs see the change
+    Object.getOwnPropertyDescriptor(proto, "value").set.call(element, field.value);
+  }
+  element.dispatchEvent(new Event("input", { bubbles: true }));
+  element.dispatchEvent(new Event("change", { bubbles: true }));
+  return true;
+})
+"""
+
+
+def form_field(step, data):
+    """What a form step would set, as passed to BATCH_SCRIPT, or None if it can't be batched"""
+    action = step["action"]
+    field = {"selector": step["selector"]}
+    if action == "fill":
+        field.update(kind="fill", value=data.get(step["field"]))
+    elif action == "fill_full_name":
+        key = "full_name_reversed" if step.get("format") == "reversed" else "full_name"
+        field.update(kind="fill", value=data.get(key))
+    elif action == "select_state":
+        key = "state_abbr" if step.get("format") == "abbr" and "state_abbr" in data else "state"
+        field.update(kind="select", value=data.get(key))
+    elif "value" in step:
+        field.update(kind="select", value=step["value"])
+    elif "label" in step:
+        field.update(kind="select", label=step["label"])
+    elif "index" in step:
+        field.update(kind="select", index=step["index"])
+    elif "field" in step:
+        field.update(kind="select", value=data.get(step["field"]))
+    else:
+        return None
+    # Missing values take the normal path, which reports them as before
+    if not isinstance(field.get("value", ""), str):
+        return None
+    return field
+
+
+def form_run(steps, index, data):
+    """Batchable (index, field) pairs for the run of form steps starting at index"""
+    run = []
+    while index < len(steps) and steps[index]["action"] in FORM_ACTIONS:
+        field = form_field(steps[index], data)
+        if field:
+            run.append((index, field))
+        index += 1
+    return run
+
+
+def fill_form(page, steps, index, data):
+    """Set the run of form steps starting at index in one evaluation.
+
+    Returns {step index: whether it was set} for every step the batch
+    covered; steps that weren't set still need their normal step. Runs of a
+    single field are left alone.
+    """
+    run = form_run(steps, index, data)
+    if len(run) < 2:
+        return {}
+    try:
+        done = page.evaluate(BATCH_SCRIPT, [field for _, field in run])
+    except Exception:
+        done = [False] * len(run)
+    return {step_index: ok for (step_index, _), ok in zip(run, done)}
+
+
+async def fill_form_async(page, steps, index, data):
+    """Async counterpart of fill_form"""
+    run = form_run(steps, index, data)
+    if len(run) < 2:
+        return {}
+    try:
+        done = await page.evaluate(BATCH_SCRIPT, [field for _, field in run])
+    except Exception:
+        done = [False] * len(run)
+    return {step_index: ok for (step_index, _), ok in zip(run, done)}
@@ -0,0 +1,198 @@
+import asyncio
+import contextlib
+import os
+import threading
+
+
+# New brokers only start while usage is below this share of the ceiling
+ADMIT_FRACTION = 0.9
+
+# Command line switch that tags a pooled Chromium so its processes can be found
+BROWSER_MARKER = "--privotron-browser="
+
+
+def _process_table():
+    # Parent of every live pid, read from /proc
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        parents[int(entry)] = int(stat.rsplit(")", 1)[1].split()[1])
+    return parents
+
+
+def _children(parents):
+    children = {}
+    for pid, parent in parents.items():
+        children.setdefault(parent, []).append(pid)
+    return children
+
+
+def _descendants(root_pid, children):
+    tree, stack = [], [root_pid]
+    while stack:
+        pid = stack.pop()
+        tree.append(pid)
+        stack.extend(children.get(pid, []))
+    return tree
+
+
+def _rss(pid):
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return 0
+
+
+def tree_rss(root_pid):
+    """Resident memory in bytes of a process and all its descendants (Linux)"""
+    return sum(_rss(pid) for pid in _descendants(root_pid, _children(_process_table())))
+
+
+def _browser_marker(pid):
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            arguments = f.read().decode(errors="replace").split("\0")
+    except OSError:
+        return None
+    for argument in arguments:
+        if argument.startswith(BROWSER_MARKER):
+            return argument[len(BROWSER_MARKER):]
+    return None
+
+
+class ResourceGovernor:
+    """Watch the run's memory and keep it under a ceiling.
+
+    A background thread samples the resident memory of this process and
+    everything it started, and of each pooled browser separately (Linux
+    only, through /proc). Brokers are admitted one at a time: while the
+    total is above 90% of the ceiling, new brokers wait until running ones
+    finish, so the number of active workers adapts to the memory available.
+    At least one broker always runs.
+    """
+
+    def __init__(self, ceiling_mb=0, interval=1.0):
+        self.ceiling = ceiling_mb * 2**20
+        self.interval = interval
+        self.enabled = os.path.isdir("/proc")
+        self.total = 0
+        self.peak = 0
+        self.browsers = {}
+        self.browser_peaks = {}
+        self.active = 0
+        self.peak_active = 0
+        self._throttled = False
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.enabled:
+            self.sample()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        elif self.ceiling:
+            print("Warning: Memory sampling needs /proc; --memory-ceiling-mb is ignored")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        """Measure the whole process tree and every pooled browser once"""
+        parents = _process_table()
+        children = _children(parents)
+        tree = _descendants(os.getpid(), children)
+        browsers = {}
+        for pid in tree:
+            marker = _browser_marker(pid)
+            # Renderers may inherit the switch; count each browser from its top process
+            if marker and _browser_marker(parents.get(pid)) != marker:
+                browsers[marker] = sum(_rss(child) for child in _descendants(pid, children))
+        total = sum(_rss(pid) for pid in tree)
+
+        with self._cond:
+            self.total = total
+            self.peak = max(self.peak, total)
+            self.browsers = browsers
+            for marker, rss in browsers.items():
+                self.browser_peaks[marker] = max(self.browser_peaks.get(marker, 0), rss)
+            self._cond.notify_all()
+
+    def browser_rss(self, marker):
+        with self._cond:
+            return self.browsers.get(marker, 0)
+
+    def _may_start(self):
+        if not self.ceiling or not self.enabled or self.active == 0:
+            return True
+        if self.total < self.ceiling * ADMIT_FRACTION:
+            self._throttled = False
+            return True
+        if not self._throttled:
+            self._throttled = True
+            print(
+                f"Memory at {self.total / 2**20:.0f} MB of {self.ceiling / 2**20:.0f} MB, "
+                f"holding back new brokers ({self.active} running)"
+            )
+        return False
+
+    def _started(self):
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+
+    def _finished(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def admitted(self):
+        """Hold a broker back while memory is short, then count it as running"""
+        with self._cond:
+            while not self._may_start():
+                self._cond.wait(self.interval)
+            self._started()
+        try:
+            yield
+        finally:
+            self._finished()
+
+    @contextlib.asynccontextmanager
+    async def admitted_async(self):
+        """Async counterpart of admitted; polls instead of blocking the event loop"""
+        while True:
+            with self._cond:
+                if self._may_start():
+                    self._started()
+                    break
+            await asyncio.sleep(self.interval)
+        try:
+            yield
+        finally:
+            self._finished()
+
+    def report(self):
+        """Print peak memory use for the run"""
+        if not self.enabled:
+            return
+        print(
+            f"Peak memory: {self.peak / 2**20:.0f} MB total, "
+            f"{self.peak_active} brokers running at most"
+        )
+        for marker, peak in sorted(self.browser_peaks.items()):
+            print(f"  browser {marker}: {peak / 2**20:.0f} MB peak")
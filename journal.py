@@ -0,0 +1,102 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+from resilience import restart_point
+
+
+class Journal:
+    """Append-only, fsynced log of broker progress for one profile.
+
+    Every finished step and every finished broker is written and synced to
+    disk as it happens, so an interrupted run can be resumed from the last
+    safe point. With no path nothing is written, but completed brokers are
+    still tracked in memory. With `write` off an existing journal is only
+    read, so a dry run can plan a resume without touching it. A fresh run
+    starts the journal over; if the last run never finished, the brokers it
+    completed are kept in `recovered` so they can still be recorded.
+    """
+
+    def __init__(self, path, resume=False, write=True):
+        self.path = path
+        self.completed = set()
+        self.progress = {}
+        self.recovered = set()
+        self._lock = threading.Lock()
+        self._file = None
+        self._torn = False
+        self._ended = True
+
+        if path and resume:
+            self._replay()
+        elif path and write:
+            # An interrupted run never recorded its finished brokers in the profile
+            self._replay()
+            if not self._ended:
+                self.recovered = self.completed
+            self.completed, self.progress, self._torn = set(), {}, False
+        if path and write:
+            self._file = open(path, "a" if resume else "w")
+            if self._torn:
+                self._file.write("\n")
+            self._write({"type": "run", "started": datetime.now().isoformat(), "resume": resume})
+
+    def _replay(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as f:
+            for line in f:
+                self._torn = not line.endswith("\n")
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # A crash can leave a torn last line behind
+                    continue
+                if event.get("type") == "run":
+                    self._ended = False
+                elif event.get("type") == "end":
+                    self._ended = True
+                elif event.get("type") == "step":
+                    self.progress[event["broker"]] = event["index"]
+                elif event.get("type") == "broker":
+                    if event["outcome"] == "ok":
+                        self.completed.add(event["broker"])
+                    self.progress.pop(event["broker"], None)
+
+    def _write(self, event):
+        with self._lock:
+            self._file.write(json.dumps(event, separators=(",", ":")) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file:
+            self._write({"type": "end"})
+            self._file.close()
+            self._file = None
+
+    def step_done(self, slug, index):
+        if self._file:
+            self._write({"type": "step", "broker": slug, "index": index})
+
+    def broker_done(self, slug, success):
+        if success:
+            with self._lock:
+                self.completed.add(slug)
+        if self._file:
+            self._write(
+                {"type": "broker", "broker": slug, "outcome": "ok" if success else "error"}
+            )
+
+    def checkpoint(self, config):
+        """Step index to restart an interrupted broker from, or 0.
+
+        A fresh browser context has no page loaded, so a broker can only be
+        picked up again at a navigate step: the latest one at or before the
+        first step that has not completed yet.
+        """
+        last_done = self.progress.get(config["slug"])
+        if last_done is None:
+            return 0
+        return restart_point(config, last_done + 1)
@@ -1,16 +1,55 @@
 import click
-import yaml
-import time
 import os
 import sys
-import json
+import hashlib
 import asyncio
+import threading
 import concurrent.futures
+import contextlib
+import math
 from pathlib import Path
 from datetime import datetime
-from playwright.sync_api import sync_playwright
-from playwright.async_api import async_playwright
+from browser_pool import BrowserPool, AsyncBrowserPool
+from waits import WAIT_ACTIONS, StepWaiter, AsyncStepWaiter
+from prompts import PromptBroker
+from registry import BrokerRegistry, load_skip_list
+from browser_cache import HttpCache, StorageStates
+from resources import parse_block_list, apply_resource_policy, apply_resource_policy_async, broker_site
+from resilience import (
+    SITE_FAILURES,
+    TRANSIENT,
+    CircuitBreaker,
+    StepError,
+    check_response,
+    classify,
+    detect_captcha,
+    detect_captcha_async,
+    restart_point,
+    retry_delay,
+)
+from forms import FORM_ACTIONS, fill_form, fill_form_async
+from governor import ResourceGovernor
+from daemon import Daemon, submit_to_daemon
+from journal import Journal
+from planner import check_broker, print_plan
+from prefetch import LONG_WAIT, prefetch_budget, prefetch_end
+from scheduler import (
+    Dispatcher,
+    estimate_costs,
+    estimate_makespan,
+    load_history,
+    needs_human,
+    overdue_by,
+    save_history,
+    schedule,
+)
+from state import BACKENDS, DATABASE_NAME, completion_times, import_json_profiles, open_store
+from telemetry import Telemetry, navigation_bytes, navigation_bytes_async, summarize
+
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_TELEMETRY = os.path.join(BASE_DIR, ".cache", "telemetry.jsonl")
+DAEMON_STATE = os.path.join(BASE_DIR, ".cache", "daemon.json")
 
 # State name to abbreviation mapping
 STATE_ABBR = {
@@ -143,6 +182,28 @@ STATE_ABBR = {
 @click.option(
     "--save-profile", required=False, help="Save current arguments as a profile"
 )
+@click.option(
+    "--profiles",
+    required=False,
+    help="Comma separated saved profiles to process together in one batch run"
+)
+@click.option("--all-profiles", is_flag=True, help="Process every saved profile in one batch run")
+@click.option(
+    "--state-backend",
+    default="json",
+    type=click.Choice(BACKENDS),
+    help="Where profiles and processed brokers are kept: json files or a sqlite database in profiles/ (default: json)"
+)
+@click.option(
+    "--import-profiles",
+    is_flag=True,
+    help="Copy the JSON profiles into the sqlite state database and exit"
+)
+@click.option(
+    "--due",
+    is_flag=True,
+    help="Only redo processed brokers whose recheck_after_days has passed, most overdue first, plus brokers never processed"
+)
 @click.option("--reset", is_flag=True, help="Reset processed brokers for the profile")
 @click.option(
     "--parallel", 
@@ -150,25 +211,455 @@ STATE_ABBR = {
     type=int, 
     help="Number of brokers to process in parallel (default: 1)"
 )
-def run_optout(first, last, email, phone, ssn, city, state, zip, profile, save_profile, reset, parallel):
+@click.option(
+    "--browsers",
+    default=1,
+    type=int,
+    help="Number of Chromium instances kept warm and shared by all brokers (default: 1)"
+)
+@click.option(
+    "--wait-mode",
+    default="adaptive",
+    type=click.Choice(["adaptive", "migrate"]),
+    help="adaptive: end fixed waits once the page settles; migrate: keep full waits and log how long each one needed (default: adaptive)"
+)
+@click.option(
+    "--engine",
+    default="thread",
+    type=click.Choice(["thread", "async"]),
+    help="thread: one driver per worker thread; async: one driver and one event loop for all brokers (default: thread)"
+)
+@click.option("--list-brokers", is_flag=True, help="List available brokers and exit")
+@click.option(
+    "--plan",
+    is_flag=True,
+    help="Check the selected brokers against your data and print what the run would do, without starting a browser"
+)
+@click.option(
+    "--headless",
+    is_flag=True,
+    help="Run brokers without a visible browser window; brokers that prompt you still open one"
+)
+@click.option(
+    "--block",
+    default="",
+    help="Comma separated resources to block, e.g. image,media,font,third_party (brokers may override)"
+)
+@click.option(
+    "--telemetry",
+    "telemetry_path",
+    default=DEFAULT_TELEMETRY,
+    help="JSON-lines file that step timings are appended to; empty to disable"
+)
+@click.option("--stats", is_flag=True, help="Summarise recorded step timings and exit")
+@click.option(
+    "--brokers-dir",
+    "broker_dir",
+    default="brokers",
+    help="Directory containing broker YAML files (default: brokers)"
+)
+@click.option(
+    "--auto-answer",
+    is_flag=True,
+    help="Continue past record selection prompts without waiting (for benchmarks and testing)"
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="Resume the profile's interrupted run: skip finished brokers and restart partial ones at their last navigate"
+)
+@click.option(
+    "--retries",
+    default=2,
+    type=int,
+    help="Retries for transient failures such as timeouts and 5xx errors (default: 2)"
+)
+@click.option(
+    "--breaker-threshold",
+    default=3,
+    type=int,
+    help="Consecutive site failures before a broker's site is skipped (default: 3)"
+)
+@click.option(
+    "--breaker-cooldown",
+    default=60,
+    type=int,
+    help="Minutes to skip a failing site before trying it again (default: 60)"
+)
+@click.option(
+    "--browser-state",
+    default="off",
+    type=click.Choice(["off", "site", "profile"]),
+    help="Keep cookies and localStorage between runs: site: one state per broker site; profile: one per profile and site (default: off)"
+)
+@click.option(
+    "--http-cache-mb",
+    default=0,
+    type=int,
+    help="Size of the shared on-disk cache for static broker assets in MB; 0 disables it (default: 0)"
+)
+@click.option(
+    "--prefetch-mb",
+    default=0,
+    type=int,
+    help="Memory budget in MB for loading upcoming brokers while others wait on you or a long wait; 0 disables it (default: 0)"
+)
+@click.option(
+    "--memory-ceiling-mb",
+    default=0,
+    type=int,
+    help="Hold back new brokers while the run uses more than this much memory in MB; 0 disables it (default: 0)"
+)
+@click.option(
+    "--recycle-after",
+    default=0,
+    type=int,
+    help="Restart each pooled browser after this many brokers; 0 disables it (default: 0)"
+)
+@click.option(
+    "--recycle-mb",
+    default=0,
+    type=int,
+    help="Restart a pooled browser once it uses more than this much memory in MB; 0 disables it (default: 0)"
+)
+@click.option(
+    "--serve",
+    is_flag=True,
+    help="Run as a daemon that keeps brokers and browsers warm and runs submitted jobs"
+)
+@click.option(
+    "--serve-port",
+    default=0,
+    type=int,
+    help="Localhost port for the daemon's job API (default: any free port)"
+)
+@click.option(
+    "--no-daemon",
+    is_flag=True,
+    help="Run in this process even if a daemon is running"
+)
+@click.option(
+    "--host-rate",
+    default=None,
+    type=float,
+    help="Maximum broker starts per minute against any one site (default: unlimited)"
+)
+@click.option(
+    "--host-burst",
+    default=1,
+    type=int,
+    help="Broker starts a site may receive back to back under --host-rate (default: 1)"
+)
+def run_optout(first, last, email, phone, ssn, city, state, zip, profile, save_profile, profiles, all_profiles, state_backend, import_profiles, due, reset, parallel, browsers, wait_mode, engine, list_brokers, plan, headless, block, telemetry_path, stats, broker_dir, auto_answer, resume, retries, breaker_threshold, breaker_cooldown, browser_state, http_cache_mb, prefetch_mb, memory_ceiling_mb, recycle_after, recycle_mb, serve, serve_port, no_daemon, host_rate, host_burst):
+    # Inside the daemon, runs share its warm registry and browser pool
+    warm = click.get_current_context().obj
+    if serve:
+        if warm:
+            print("Error: --serve can't be submitted to a running daemon.")
+            sys.exit(1)
+        Daemon(run_optout, DAEMON_STATE, port=serve_port).run()
+        return
+    # Record selection prompts are forwarded back to this console by the daemon
+    if not warm and not no_daemon and os.path.exists(DAEMON_STATE):
+        exit_code = submit_to_daemon(DAEMON_STATE, sys.argv[1:])
+        if exit_code is not None:
+            sys.exit(exit_code)
+
+    if stats:
+        summarize(telemetry_path or DEFAULT_TELEMETRY)
+        return
+
+    # Validate the run-wide resource policy
+    try:
+        block = parse_block_list(block)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
     # Set up directories and files
-    broker_dir = "brokers"
     skip_file = os.path.join(broker_dir, ".skipbrokers")
-    profiles_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+    profiles_dir = os.path.join(BASE_DIR, "profiles")
     os.makedirs(profiles_dir, exist_ok=True)
 
+    if import_profiles:
+        with contextlib.closing(open_store("sqlite", profiles_dir)) as database:
+            imported = import_json_profiles(profiles_dir, database)
+        print(f"Imported {len(imported)} profiles into {os.path.join(profiles_dir, DATABASE_NAME)}")
+        return
+
+    # Load the compiled broker registry (YAML is only parsed for changed files)
+    registry = warm.registry(broker_dir, load_registry) if warm else load_registry(broker_dir)
+    for filename, errors in registry.errors.items():
+        print(f"Error in {filename}, skipping it: {'; '.join(errors)}")
+
+    if list_brokers:
+        for broker_slug in registry.slugs():
+            config = registry.get(broker_slug)
+            print(f"{broker_slug}: {config['name']} ({len(config['steps'])} steps)")
+        return
+
+    # Work out which identities this run opts out
+    started = datetime.now().isoformat()
+    store = open_store(state_backend, profiles_dir)
+    if profiles or all_profiles:
+        if profile or save_profile:
+            print("Error: --profiles and --all-profiles can't be combined with --profile or --save-profile.")
+            sys.exit(1)
+        if all_profiles:
+            names = store.names()
+        else:
+            names = list(dict.fromkeys(name.strip() for name in profiles.split(",") if name.strip()))
+        identities = []
+        for name in names:
+            identity = load_identity(store, name, reset)
+            if identity:
+                identities.append(identity)
+        if not identities:
+            print("Error: No usable profiles to process.")
+            sys.exit(1)
+        print(f"Batch run for {len(identities)} profiles: {', '.join(i['profile'] for i in identities)}")
+    else:
+        identities = [
+            single_identity(
+                store, first, last, email, phone, ssn, city, state, zip,
+                profile, save_profile, reset,
+            )
+        ]
+    batch = bool(profiles or all_profiles)
+
+    # Journal progress per profile so an interrupted run can be resumed
+    if resume and not identities[0]["profile"]:
+        print("Error: --resume needs a --profile to resume.")
+        sys.exit(1)
+
+    # Read skip file if it exists
+    skipped_brokers = set()
+    try:
+        skipped_brokers = load_skip_list(skip_file)
+        if skipped_brokers:
+            print(f"Skipping brokers: {', '.join(sorted(skipped_brokers))}")
+    except Exception as e:
+        print(f"Warning: Could not read skip file: {e}")
+
+    # Expand into one job per (identity, broker) pair, filtering by slug
+    # before touching any broker config
+    jobs = []
+    now = datetime.now()
+    for identity in identities:
+        journal_path = None
+        if identity["profile"]:
+            journal_path = os.path.join(profiles_dir, f"{identity['profile']}.journal.jsonl")
+        journal = identity["journal"] = Journal(
+            journal_path, resume=resume and not reset, write=not plan
+        )
+        if journal.recovered:
+            print(
+                f"Recovered {len(journal.recovered)} brokers finished by an interrupted run"
+                f" of profile {identity['profile']}"
+            )
+            update_processed_brokers(store, identity["profile"], journal.recovered)
+            if not reset:
+                identity["processed"].update(dict.fromkeys(journal.recovered, now))
+        identity["attempted"] = set()
+        suffix = f" [{identity['profile']}]" if batch else ""
+
+        for broker_slug in registry.slugs():
+            config = registry.get(broker_slug)
+            label = config["name"] + suffix
+
+            # Skip this broker if its slug is in the skip list
+            if broker_slug in skipped_brokers:
+                if not batch:
+                    print(f"Skipping {label} (from skip file)")
+                continue
+
+            # Skip if already processed for this profile, unless a recheck is due
+            overdue = math.inf
+            if broker_slug in identity["processed"]:
+                completed_at = identity["processed"][broker_slug]
+                overdue = overdue_by(config, completed_at, now) if due else None
+                if overdue is None:
+                    print(f"Skipping {label} (already processed)")
+                    continue
+                print(f"Rechecking {label} (last completed {completed_at or 'at an unknown time'})")
+
+            # Skip if it finished before the interrupted run stopped
+            if broker_slug in journal.completed:
+                print(f"Skipping {label} (finished before interruption)")
+                continue
+
+            # Drop brokers that can't succeed with this data before any browser starts
+            checkpoint = journal.checkpoint(config)
+            problems = check_broker(config, identity["data"], checkpoint)
+            if problems:
+                print(f"✗ Skipping {label}: {'; '.join(problems)}")
+                continue
+            if checkpoint:
+                print(f"Resuming {label} from step {checkpoint}")
+            identity["attempted"].add(broker_slug)
+            jobs.append(
+                {
+                    "config": config,
+                    "data": identity["data"],
+                    "journal": journal,
+                    "start": checkpoint,
+                    "label": label,
+                    "profile": identity["profile"],
+                    "overdue": overdue,
+                }
+            )
+
+    # If no brokers to process, exit early
+    if not jobs:
+        print("No brokers to process. All have been skipped or already processed.")
+        close_identities(store, identities, started, record=not plan)
+        return
+
+    # Validate parallel value
+    if parallel < 1:
+        print("Parallel value must be at least 1. Setting to 1.")
+        parallel = 1
+    elif parallel > len(jobs):
+        print(f"Parallel value {parallel} is greater than number of brokers ({len(jobs)}). Setting to {len(jobs)}.")
+        parallel = len(jobs)
+
+    # Hand out the longest brokers first, based on past runs where available
+    configs = list({job["config"]["slug"]: job["config"] for job in jobs}.values())
+    history = load_history(telemetry_path or DEFAULT_TELEMETRY)
+    costs = estimate_costs(configs, history)
+    if due:
+        # Periodic runs catch up on the most overdue brokers first
+        jobs.sort(key=lambda job: -job["overdue"])
+    else:
+        jobs = schedule(jobs, costs)
+    print(
+        f"Estimated run time: {estimate_makespan(jobs, costs, parallel):.0f}s "
+        f"for {len(jobs)} brokers"
+    )
+    if plan:
+        print_plan(jobs, costs)
+        print("Dry run: no browser was started and nothing was recorded")
+        close_identities(store, identities, started, record=False)
+        return
+
+    # Options shared by every broker run
+    options = {
+        "wait_mode": wait_mode,
+        "headless": headless,
+        "block": block,
+        "telemetry": Telemetry(telemetry_path),
+        "auto_answer": auto_answer,
+        # A daemon job's prompts are answered by the client that submitted it
+        "answer": warm.job.answer_prompt if warm else None,
+        "retries": max(0, retries),
+        "host_rate": host_rate,
+        "host_burst": host_burst,
+        "states": None,
+        "prefetch": prefetch_budget(prefetch_mb),
+        "http_cache": None,
+        "governor": ResourceGovernor(memory_ceiling_mb).start(),
+        "recycle_after": max(0, recycle_after),
+        "recycle_bytes": max(0, recycle_mb) * 2**20,
+        "breaker": CircuitBreaker(
+            os.path.join(BASE_DIR, ".cache", "circuits.json"),
+            threshold=breaker_threshold,
+            cooldown=breaker_cooldown * 60,
+        ),
+    }
+
+    # Carry browser state and static assets over from earlier runs if asked to
+    if browser_state != "off":
+        options["states"] = StorageStates(
+            os.path.join(BASE_DIR, ".cache", "browser-state"),
+            per_profile=browser_state == "profile",
+        )
+    if http_cache_mb > 0:
+        options["http_cache"] = HttpCache(
+            os.path.join(BASE_DIR, ".cache", "http"), http_cache_mb * 2**20
+        )
+
+    # Validate browser pool size
+    if browsers < 1:
+        print("Browsers value must be at least 1. Setting to 1.")
+        browsers = 1
+    elif browsers > len(jobs):
+        browsers = len(jobs)
+
+    # Choose processing method based on engine and parallel value
+    if engine == "async":
+        # Drive every broker's page from one event loop
+        print(f"Processing {len(jobs)} brokers with up to {parallel} concurrent pages")
+        engine_run = process_brokers_async(jobs, parallel, browsers, options, warm)
+        if warm:
+            # The daemon's async pool lives on its own long-lived loop
+            warm.run(engine_run)
+        else:
+            asyncio.run(engine_run)
+    else:
+        modes = {runs_headless(job["config"], options) for job in jobs}
+        with warm.pool(browsers, modes) if warm else BrowserPool(size=browsers, modes=modes) as pool:
+            if parallel == 1 and not options["prefetch"]:
+                # Process brokers sequentially (original method)
+                process_brokers_sequentially(jobs, pool, options)
+            else:
+                # Process brokers in parallel
+                print(f"Processing {len(jobs)} brokers with {parallel} parallel workers")
+                process_brokers_in_parallel(jobs, parallel, pool, options)
+    options["telemetry"].close()
+    if telemetry_path:
+        save_history(telemetry_path, history, options["telemetry"].durations)
+    options["governor"].stop()
+    options["governor"].report()
+    if options["http_cache"]:
+        cache = options["http_cache"]
+        print(f"HTTP cache: {cache.hits} hits, {cache.misses} misses")
+
+    # Update each profile with the brokers that completed successfully
+    close_identities(store, identities, started)
+
+
+def load_registry(broker_dir):
+    """Load a broker directory through its compiled on-disk cache"""
+    cache_key = hashlib.sha1(os.path.abspath(broker_dir).encode()).hexdigest()[:12]
+    return BrokerRegistry(
+        broker_dir, os.path.join(BASE_DIR, ".cache", f"registry-{cache_key}.json")
+    )
+
+
+def build_data(fields):
+    """Step data for one identity, adding name variations and the state abbreviation"""
+    data = {
+        key: fields.get(key)
+        for key in ("first_name", "last_name", "email", "phone", "ssn", "zip", "city", "state")
+    }
+    first, last, state = data["first_name"], data["last_name"], data["state"]
+
+    # Add full name (first + last)
+    if first and last:
+        data["full_name"] = f"{first} {last}"
+        # Also add variations
+        data["full_name_reversed"] = f"{last}, {first}"
+
+    # Add state abbreviation if state is provided
+    if state and state in STATE_ABBR:
+        data["state_abbr"] = STATE_ABBR[state]
+    return data
+
+
+def single_identity(store, first, last, email, phone, ssn, city, state, zip, profile, save_profile, reset):
+    """The identity for a single-profile run, from the command line and --profile"""
     # Handle profile loading and saving
-    user_data = {}
     processed_brokers = []
-    profile_path = None
+    processed_at = {}
 
     if profile:
-        profile_path = os.path.join(profiles_dir, f"{profile}.json")
-        if os.path.exists(profile_path):
-            try:
-                with open(profile_path, "r") as f:
-                    user_data = json.load(f)
-
+        try:
+            user_data = store.load(profile)
+            if user_data is None:
+                print(
+                    f"Profile {profile} not found. Will create it if --save-profile is used."
+                )
+            else:
                 # Load user info from profile if not provided in command line
                 first = first or user_data.get("first_name")
                 last = last or user_data.get("last_name")
@@ -182,18 +673,26 @@ def run_optout(first, last, email, phone, ssn, city, state, zip, profile, save_p
                 # Get list of already processed brokers
                 if not reset:
                     processed_brokers = user_data.get("processed_brokers", [])
+                    processed_at = completion_times(user_data)
                     if processed_brokers:
                         print(
                             f"Previously processed brokers for {profile}: {', '.join(processed_brokers)}"
                         )
 
                 print(f"Loaded profile: {profile}")
-            except Exception as e:
-                print(f"Error loading profile {profile}: {e}")
-        else:
-            print(
-                f"Profile {profile} not found. Will create it if --save-profile is used."
-            )
+        except Exception as e:
+            print(f"Error loading profile {profile}: {e}")
+
+    fields = {
+        "first_name": first,
+        "last_name": last,
+        "email": email,
+        "phone": phone,
+        "ssn": ssn,
+        "zip": zip,
+        "city": city,
+        "state": state,
+    }
 
     # Check if we need to save this as a new profile
     if save_profile:
@@ -203,23 +702,17 @@ def run_optout(first, last, email, phone, ssn, city, state, zip, profile, save_p
             )
             sys.exit(1)
 
-        profile_path = os.path.join(profiles_dir, f"{save_profile}.json")
-        user_data = {
-            "first_name": first,
-            "last_name": last,
-            "email": email,
-            "phone": phone,
-            "ssn": ssn,
-            "zip": zip,
-            "city": city,
-            "state": state,
-            "processed_brokers": processed_brokers,
-            "last_updated": datetime.now().isoformat(),
-        }
-
         try:
-            with open(profile_path, "w") as f:
-                json.dump(user_data, f, indent=2)
+            store.save(
+                save_profile,
+                dict(
+                    fields,
+                    processed_brokers=processed_brokers,
+                    processed_at={
+                        slug: stamp.isoformat() for slug, stamp in processed_at.items() if stamp
+                    },
+                ),
+            )
             print(f"Saved profile: {save_profile}")
         except Exception as e:
             print(f"Error saving profile {save_profile}: {e}")
@@ -231,147 +724,111 @@ def run_optout(first, last, email, phone, ssn, city, state, zip, profile, save_p
         )
         sys.exit(1)
 
-    configs = []
-    skipped_brokers = []
-    newly_processed_brokers = []
+    return {
+        "profile": profile,
+        "data": build_data(fields),
+        "processed": processed_at,
+    }
 
-    # Read skip file if it exists
-    if os.path.exists(skip_file):
-        try:
-            with open(skip_file, "r") as f:
-                skipped_brokers = [
-                    line.strip()
-                    for line in f
-                    if line.strip() and not line.startswith("#")
-                ]
-            print(f"Skipping brokers: {', '.join(skipped_brokers)}")
-        except Exception as e:
-            print(f"Warning: Could not read skip file: {e}")
 
-    # Iterate through all yaml files in brokers directory
-    for filename in os.listdir(broker_dir):
-        if filename.endswith(".yaml"):
-            yaml_path = os.path.join(broker_dir, filename)
-            try:
-                with open(yaml_path, "r") as f:
-                    config = yaml.safe_load(f)
-                    broker_slug = config.get("slug")
-
-                    # Skip this broker if its slug is in the skip list
-                    if broker_slug in skipped_brokers:
-                        print(f"Skipping {config['name']} (from skip file)")
-                        continue
-
-                    # Skip if already processed for this profile
-                    if broker_slug in processed_brokers:
-                        print(f"Skipping {config['name']} (already processed)")
-                        continue
-
-                    configs.append(config)
-                    newly_processed_brokers.append(broker_slug)
-            except yaml.YAMLError as e:
-                print(f"Error parsing {filename}: {e}")
-                sys.exit(1)
-            except FileNotFoundError:
-                print(f"Could not find {filename}")
-                sys.exit(1)
+def load_identity(store, profile, reset):
+    """The identity for one profile of a batch run, or None if it can't be used"""
+    try:
+        user_data = store.load(profile)
+    except Exception as e:
+        print(f"Error loading profile {profile}, skipping it: {e}")
+        return None
+    if user_data is None:
+        print(f"Profile {profile} not found, skipping it.")
+        return None
 
-    # If no brokers to process, exit early
-    if not configs:
-        print("No brokers to process. All have been skipped or already processed.")
-        return
+    if not all(user_data.get(key) for key in ("first_name", "last_name", "email", "zip")):
+        print(f"Profile {profile} is missing required information (first, last, email, zip), skipping it.")
+        return None
 
-    # Create data dictionary with both full state name and abbreviation
-    data = {
-        "first_name": first, 
-        "last_name": last, 
-        "email": email, 
-        "phone": phone,
-        "ssn": ssn,
-        "zip": zip,
-        "city": city,
-        "state": state
+    processed = {} if reset else completion_times(user_data)
+    return {
+        "profile": profile,
+        "data": build_data(user_data),
+        "processed": processed,
     }
-    
-    # Add full name (first + last)
-    if first and last:
-        data["full_name"] = f"{first} {last}"
-        # Also add variations
-        data["full_name_reversed"] = f"{last}, {first}"
-    
-    # Add state abbreviation if state is provided
-    if state and state in STATE_ABBR:
-        data["state_abbr"] = STATE_ABBR[state]
 
-    # Validate parallel value
-    if parallel < 1:
-        print("Parallel value must be at least 1. Setting to 1.")
-        parallel = 1
-    elif parallel > len(configs):
-        print(f"Parallel value {parallel} is greater than number of brokers ({len(configs)}). Setting to {len(configs)}.")
-        parallel = len(configs)
-
-    # Choose processing method based on parallel value
-    if parallel == 1:
-        # Process brokers sequentially (original method)
-        process_brokers_sequentially(configs, data, profile, profile_path)
-    else:
-        # Process brokers in parallel
-        print(f"Processing {len(configs)} brokers with {parallel} parallel workers")
-        process_brokers_in_parallel(configs, data, parallel)
 
-    # Update profile with newly processed brokers
-    if profile and profile_path and newly_processed_brokers:
-        try:
-            # Reload the profile in case it was modified elsewhere
-            if os.path.exists(profile_path):
-                with open(profile_path, "r") as f:
-                    user_data = json.load(f)
-
-            # Update the processed brokers list
-            current_processed = user_data.get("processed_brokers", [])
-            current_processed.extend(newly_processed_brokers)
-            user_data["processed_brokers"] = list(
-                set(current_processed)
-            )  # Remove duplicates
-            user_data["last_updated"] = datetime.now().isoformat()
-
-            # Save the updated profile
-            with open(profile_path, "w") as f:
-                json.dump(user_data, f, indent=2)
+def close_identities(store, identities, started, record=True):
+    """Close each identity's journal and record its run and completed brokers"""
+    for identity in identities:
+        journal = identity["journal"]
+        journal.close()
+        if not identity["profile"] or not record:
+            continue
+        if journal.completed:
+            update_processed_brokers(store, identity["profile"], journal.completed)
+        if identity["attempted"]:
+            try:
+                store.record_run(
+                    identity["profile"],
+                    started,
+                    len(identity["attempted"]),
+                    len(identity["attempted"] & journal.completed),
+                )
+            except Exception as e:
+                print(f"Error recording run for profile {identity['profile']}: {e}")
+    store.close()
 
-            print(
-                f"Updated profile {profile} with {len(newly_processed_brokers)} newly processed brokers"
-            )
-        except Exception as e:
-            print(f"Error updating profile {profile}: {e}")
+
+def update_processed_brokers(store, profile, completed):
+    """Add completed broker slugs to a profile's processed_brokers"""
+    try:
+        newly_processed = store.mark_processed(profile, completed)
+        print(
+            f"Updated profile {profile} with {newly_processed} newly processed brokers"
+        )
+    except Exception as e:
+        print(f"Error updating profile {profile}: {e}")
 
 
-def process_brokers_sequentially(configs, data, profile, profile_path):
-    """Process brokers one at a time (original method)"""
-    for config in configs:
-        print(f"Processing {config['name']}...")
-        try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=False)
-                page = browser.new_page()
+def runs_headless(config, options):
+    """Brokers run headless when asked to, unless someone has to use their page"""
+    return options["headless"] and (options["auto_answer"] or not needs_human(config))
 
-                for step in config["steps"]:
+
+def run_steps(page, job, options, start=0, stop=None):
+    """Run a broker's configured steps, from start up to stop, against an open page"""
+    config, data = job["config"], job["data"]
+    waiter = StepWaiter(page, job["label"], options["wait_mode"])
+    batched = {}
+    try:
+        for index, step in enumerate(config["steps"]):
+            if index < start:
+                continue
+            if stop is not None and index >= stop:
+                break
+            try:
+                with options["telemetry"].step(config, index, step) as event:
                     action = step["action"]
-                    if action == "navigate":
-                        page.goto(step["url"])
+                    if action in WAIT_ACTIONS:
+                        if action == "wait" and step["seconds"] >= LONG_WAIT and options.get("on_idle"):
+                            # Get the next broker's page ready while this one sits idle
+                            options["on_idle"]()
+                        waiter.wait(step, index)
+                    else:
+                        waiter.mark()
+                    if action in FORM_ACTIONS and index not in batched and config.get("batch_fill", True):
+                        # Set this and the following form steps in one round trip
+                        batched = fill_form(page, config["steps"], index, data)
+                    if batched.get(index):
+                        event["batched"] = True
+                    elif action == "navigate":
+                        response = page.goto(step["url"])
+                        event["bytes"] = navigation_bytes(response)
+                        check_response(response, step["url"])
                     elif action == "fill":
                         page.fill(step["selector"], data[step["field"]])
                     elif action == "click":
                         page.click(step["selector"])
-                    elif action == "wait":
-                        time.sleep(step["seconds"])
                     elif action == "prompt_user_to_select_record":
-                        print(step["description"])
-                        print(
-                            ">> Please select the correct record manually in the browser."
-                        )
-                        input("Press Enter once done...")
+                        # Hand the page over to the operator through the shared console
+                        options["prompts"].ask(job["label"], step["description"], page)
                     elif action == 'select':
                         if 'value' in step:
                             page.select_option(step['selector'], step['value'])
@@ -396,152 +853,437 @@ def process_brokers_sequentially(configs, data, profile, profile_path):
                             page.fill(step['selector'], data['full_name_reversed'])
                         else:
                             page.fill(step['selector'], data['full_name'])
-                    else:
+                    elif action not in WAIT_ACTIONS:
                         print(f"Unknown action: {action}")
+            except Exception as e:
+                raise StepError(index, step["action"], e) from e
+            job["journal"].step_done(config["slug"], index)
+    finally:
+        waiter.close()
 
-                browser.close()
-            print(f"✓ Completed {config['name']}")
-        except Exception as e:
-            print(f"✗ Error processing {config['name']}: {e}")
+
+def run_with_retries(page, job, options):
+    """Run a broker's steps, retrying transient failures from the last navigate"""
+    config = job["config"]
+    site = broker_site(config)
+    start = job["start"]
+    for attempt in range(options["retries"] + 1):
+        try:
+            run_steps(page, job, options, start)
+            options["breaker"].record_success(site)
+            return
+        except StepError as e:
+            e.kind = classify(e, detect_captcha(page))
+            if (
+                e.kind not in TRANSIENT
+                or attempt == options["retries"]
+                or not options["breaker"].allow(site)
+            ):
+                # A broker run counts once against its site, however many attempts it took
+                if e.kind in SITE_FAILURES:
+                    options["breaker"].record_failure(site)
+                raise
+            start = restart_point(config, e.index)
+            delay = retry_delay(attempt)
+            print(
+                f"↻ {job['label']}: {e.kind} at step {e.index}, "
+                f"retrying from step {start} in {delay:.1f}s"
+            )
+            # Back off on the page so its route handlers keep being served
+            page.wait_for_timeout(delay * 1000)
 
 
-async def process_broker_async(config, data):
-    """Process a single broker asynchronously"""
-    print(f"Starting {config['name']}...")
+def prefetch_steps(page, job, options):
+    """Run a broker's leading page loads and form fills; returns the job to continue"""
+    stop = prefetch_end(job["config"], job["start"])
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=False)
-            page = await browser.new_page()
-
-            for step in config["steps"]:
-                action = step["action"]
-                if action == "navigate":
-                    await page.goto(step["url"])
-                elif action == "fill":
-                    await page.fill(step["selector"], data[step["field"]])
-                elif action == "click":
-                    await page.click(step["selector"])
-                elif action == "wait":
-                    await asyncio.sleep(step["seconds"])
-                elif action == "prompt_user_to_select_record":
-                    print(step["description"])
-                    print(
-                        f">> Please select the correct record manually in the browser for {config['name']}."
-                    )
-                    # This will block the current task but allow other tasks to continue
-                    await asyncio.to_thread(input, f"Press Enter once done with {config['name']}...")
-                elif action == 'select':
-                    if 'value' in step:
-                        await page.select_option(step['selector'], step['value'])
-                    elif 'label' in step:
-                        await page.select_option(step['selector'], label=step['label'])
-                    elif 'index' in step:
-                        await page.select_option(step['selector'], index=step['index'])
-                    elif 'field' in step:
-                        # Get the value from the data dictionary
-                        field_value = data[step['field']]
-                        await page.select_option(step['selector'], field_value)
-                elif action == 'select_state':
-                    # Special handling for state selection
-                    if step.get('format') == 'abbr' and 'state_abbr' in data:
-                        await page.select_option(step['selector'], data['state_abbr'])
-                    else:
-                        await page.select_option(step['selector'], data['state'])
-                elif action == 'fill_full_name':
-                    # Special handling for full name fields
-                    format_type = step.get('format', 'standard')
-                    if format_type == 'reversed':
-                        await page.fill(step['selector'], data['full_name_reversed'])
-                    else:
-                        await page.fill(step['selector'], data['full_name'])
-                else:
-                    print(f"Unknown action: {action}")
+        run_steps(page, job, options, job["start"], stop)
+    except StepError:
+        # Leave it to the normal run, which retries from the start
+        return job
+    print(f"Prefetched {job['label']} up to step {stop}")
+    return dict(job, start=stop)
+
+
+def recycle_browsers(pool, options):
+    """Replace pooled browsers past --recycle-after or --recycle-mb (awaitable for the async pool)"""
+    return pool.maintain(options["recycle_after"], options["recycle_bytes"], options["governor"])
 
-            await browser.close()
-        print(f"✓ Completed {config['name']}")
+
+def process_broker(job, pool, options, gate=None):
+    """Process a single broker on the calling thread.
+
+    With a gate (the engine's worker slots) the broker is being prefetched:
+    its leading steps run straight away and the rest once the gate admits it.
+    """
+    config = job["config"]
+    print(f"Starting {job['label']}...")
+    site = broker_site(config)
+    if not options["breaker"].allow(site):
+        print(f"✗ Skipping {job['label']}: {site} keeps failing, waiting for its cooldown")
+        return False
+    try:
+        states = options["states"]
+        # Wait for room under the memory ceiling before opening a context. A
+        # prefetched broker is only admitted once it holds a slot, so parked
+        # prefetchers never hold back the workers that would free memory.
+        admission = options["governor"].admitted() if gate is None else contextlib.nullcontext()
+        with admission:
+            with options["telemetry"].broker(config), pool.context(
+                headless=runs_headless(config, options),
+                **(states.context_options(job) if states else {}),
+            ) as context:
+                apply_resource_policy(context, config, options["block"], options["http_cache"])
+                page = context.new_page()
+                if gate is None:
+                    run_with_retries(page, job, options)
+                else:
+                    job = prefetch_steps(page, job, options)
+                    with gate, options["governor"].admitted():
+                        run_with_retries(page, job, options)
+                if states:
+                    states.save(context, job)
+        job["journal"].broker_done(config["slug"], True)
+        print(f"✓ Completed {job['label']}")
         return True
     except Exception as e:
-        print(f"✗ Error processing {config['name']}: {e}")
+        job["journal"].broker_done(config["slug"], False)
+        print(f"✗ Error processing {job['label']}: {e}")
         return False
 
 
-def process_broker_thread(config, data):
-    """Process a single broker in a thread"""
-    print(f"Starting {config['name']}...")
+def process_brokers_sequentially(jobs, pool, options):
+    """Process brokers one at a time (original method)"""
+    # The dispatcher still applies per-site limits such as min_interval and --host-rate
+    dispatcher = Dispatcher(jobs, options["host_rate"], options["host_burst"])
+    with PromptBroker(
+        auto_answer=options["auto_answer"], answer=options["answer"]
+    ) as prompts:
+        options = dict(options, prompts=prompts)
+        while True:
+            job = dispatcher.next()
+            if job is None:
+                break
+            try:
+                process_broker(job, pool, options)
+            finally:
+                dispatcher.done(job)
+            recycle_browsers(pool, options)
+
+
+async def run_steps_async(page, job, options, start=0, stop=None):
+    """Run a broker's configured steps, from start up to stop, against an open page (async API)"""
+    config, data = job["config"], job["data"]
+    waiter = AsyncStepWaiter(page, job["label"], options["wait_mode"])
+    batched = {}
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=False)
-            page = browser.new_page()
-
-            for step in config["steps"]:
-                action = step["action"]
-                if action == "navigate":
-                    page.goto(step["url"])
-                elif action == "fill":
-                    page.fill(step["selector"], data[step["field"]])
-                elif action == "click":
-                    page.click(step["selector"])
-                elif action == "wait":
-                    time.sleep(step["seconds"])
-                elif action == "prompt_user_to_select_record":
-                    print(step["description"])
-                    print(
-                        f">> Please select the correct record manually in the browser for {config['name']}."
-                    )
-                    input(f"Press Enter once done with {config['name']}...")
-                elif action == 'select':
-                    if 'value' in step:
-                        page.select_option(step['selector'], step['value'])
-                    elif 'label' in step:
-                        page.select_option(step['selector'], label=step['label'])
-                    elif 'index' in step:
-                        page.select_option(step['selector'], index=step['index'])
-                    elif 'field' in step:
-                        # Get the value from the data dictionary
-                        field_value = data[step['field']]
-                        page.select_option(step['selector'], field_value)
-                elif action == 'select_state':
-                    # Special handling for state selection
-                    if step.get('format') == 'abbr' and 'state_abbr' in data:
-                        page.select_option(step['selector'], data['state_abbr'])
-                    else:
-                        page.select_option(step['selector'], data['state'])
-                elif action == 'fill_full_name':
-                    # Special handling for full name fields
-                    format_type = step.get('format', 'standard')
-                    if format_type == 'reversed':
-                        page.fill(step['selector'], data['full_name_reversed'])
+        for index, step in enumerate(config["steps"]):
+            if index < start:
+                continue
+            if stop is not None and index >= stop:
+                break
+            try:
+                with options["telemetry"].step(config, index, step) as event:
+                    action = step["action"]
+                    if action in WAIT_ACTIONS:
+                        if action == "wait" and step["seconds"] >= LONG_WAIT and options.get("on_idle"):
+                            # Get the next broker's page ready while this one sits idle
+                            options["on_idle"]()
+                        await waiter.wait(step, index)
                     else:
-                        page.fill(step['selector'], data['full_name'])
-                else:
-                    print(f"Unknown action: {action}")
+                        waiter.mark()
+                    if action in FORM_ACTIONS and index not in batched and config.get("batch_fill", True):
+                        # Set this and the following form steps in one round trip
+                        batched = await fill_form_async(page, config["steps"], index, data)
+                    if batched.get(index):
+                        event["batched"] = True
+                    elif action == "navigate":
+                        response = await page.goto(step["url"])
+                        event["bytes"] = await navigation_bytes_async(response)
+                        check_response(response, step["url"])
+                    elif action == "fill":
+                        await page.fill(step["selector"], data[step["field"]])
+                    elif action == "click":
+                        await page.click(step["selector"])
+                    elif action == "prompt_user_to_select_record":
+                        # Suspends only this task; other brokers keep running meanwhile
+                        await options["prompts"].ask_async(job["label"], step["description"])
+                    elif action == 'select':
+                        if 'value' in step:
+                            await page.select_option(step['selector'], step['value'])
+                        elif 'label' in step:
+                            await page.select_option(step['selector'], label=step['label'])
+                        elif 'index' in step:
+                            await page.select_option(step['selector'], index=step['index'])
+                        elif 'field' in step:
+                            # Get the value from the data dictionary
+                            field_value = data[step['field']]
+                            await page.select_option(step['selector'], field_value)
+                    elif action == 'select_state':
+                        # Special handling for state selection
+                        if step.get('format') == 'abbr' and 'state_abbr' in data:
+                            await page.select_option(step['selector'], data['state_abbr'])
+                        else:
+                            await page.select_option(step['selector'], data['state'])
+                    elif action == 'fill_full_name':
+                        # Special handling for full name fields
+                        format_type = step.get('format', 'standard')
+                        if format_type == 'reversed':
+                            await page.fill(step['selector'], data['full_name_reversed'])
+                        else:
+                            await page.fill(step['selector'], data['full_name'])
+                    elif action not in WAIT_ACTIONS:
+                        print(f"Unknown action: {action}")
+            except Exception as e:
+                raise StepError(index, step["action"], e) from e
+            job["journal"].step_done(config["slug"], index)
+    finally:
+        waiter.close()
+
+
+async def run_with_retries_async(page, job, options):
+    """Async counterpart of run_with_retries"""
+    config = job["config"]
+    site = broker_site(config)
+    start = job["start"]
+    for attempt in range(options["retries"] + 1):
+        try:
+            await run_steps_async(page, job, options, start)
+            options["breaker"].record_success(site)
+            return
+        except StepError as e:
+            e.kind = classify(e, await detect_captcha_async(page))
+            if (
+                e.kind not in TRANSIENT
+                or attempt == options["retries"]
+                or not options["breaker"].allow(site)
+            ):
+                # A broker run counts once against its site, however many attempts it took
+                if e.kind in SITE_FAILURES:
+                    options["breaker"].record_failure(site)
+                raise
+            start = restart_point(config, e.index)
+            delay = retry_delay(attempt)
+            print(
+                f"↻ {job['label']}: {e.kind} at step {e.index}, "
+                f"retrying from step {start} in {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
 
-            browser.close()
-        print(f"✓ Completed {config['name']}")
+
+async def prefetch_steps_async(page, job, options):
+    """Async counterpart of prefetch_steps"""
+    stop = prefetch_end(job["config"], job["start"])
+    try:
+        await run_steps_async(page, job, options, job["start"], stop)
+    except StepError:
+        return job
+    print(f"Prefetched {job['label']} up to step {stop}")
+    return dict(job, start=stop)
+
+
+async def process_broker_async(job, pool, options, gate=None):
+    """Process a single broker asynchronously; see process_broker for the gate"""
+    config = job["config"]
+    print(f"Starting {job['label']}...")
+    site = broker_site(config)
+    if not options["breaker"].allow(site):
+        print(f"✗ Skipping {job['label']}: {site} keeps failing, waiting for its cooldown")
+        return False
+    try:
+        states = options["states"]
+        admission = (
+            options["governor"].admitted_async() if gate is None else contextlib.nullcontext()
+        )
+        async with admission:
+            with options["telemetry"].broker(config):
+                async with pool.context(
+                    headless=runs_headless(config, options),
+                    **(states.context_options(job) if states else {}),
+                ) as context:
+                    await apply_resource_policy_async(
+                        context, config, options["block"], options["http_cache"]
+                    )
+                    page = await context.new_page()
+                    if gate is None:
+                        await run_with_retries_async(page, job, options)
+                    else:
+                        job = await prefetch_steps_async(page, job, options)
+                        async with gate, options["governor"].admitted_async():
+                            await run_with_retries_async(page, job, options)
+                    if states:
+                        await states.save_async(context, job)
+        job["journal"].broker_done(config["slug"], True)
+        print(f"✓ Completed {job['label']}")
         return True
     except Exception as e:
-        print(f"✗ Error processing {config['name']}: {e}")
+        job["journal"].broker_done(config["slug"], False)
+        print(f"✗ Error processing {job['label']}: {e}")
         return False
 
 
-def process_brokers_in_parallel(configs, data, parallel):
+async def process_brokers_async(jobs, parallel, browsers, options, warm=None):
+    """Process brokers concurrently on one event loop with a single driver"""
+    dispatcher = Dispatcher(jobs, options["host_rate"], options["host_burst"])
+    workers = []
+
+    # At most `parallel` workers run automated steps at once. A worker waiting
+    # on a human gives its slot back and a fresh worker is started to use it.
+    semaphore = asyncio.Semaphore(parallel)
+
+    def spawn_worker():
+        if dispatcher.has_pending():
+            workers.append(asyncio.get_running_loop().create_task(worker()))
+
+    # While a broker waits on a human or a long wait, the next one is loaded
+    # ahead of time by a prefetcher, as far as the memory budget allows
+    budget = options["prefetch"]
+
+    def spawn_prefetcher():
+        if budget and dispatcher.has_pending() and budget.acquire(blocking=False):
+            workers.append(asyncio.get_running_loop().create_task(prefetcher()))
+
+    def on_park():
+        spawn_worker()
+        spawn_prefetcher()
+
+    prompts = PromptBroker(
+        slots=semaphore,
+        on_park=on_park,
+        auto_answer=options["auto_answer"],
+        answer=options["answer"],
+    ).start()
+    options = dict(options, prompts=prompts, on_idle=spawn_prefetcher)
+
+    async def prefetcher():
+        try:
+            job = dispatcher.next_nowait()
+            if job is None:
+                return
+            try:
+                success = await process_broker_async(job, pool, options, gate=semaphore)
+                if not success:
+                    print(f"Failed to process {job['label']}")
+            except Exception as e:
+                print(f"Exception processing {job['label']}: {e}")
+            finally:
+                dispatcher.done(job)
+        finally:
+            budget.release()
+
+    async def worker():
+        while True:
+            # Take the broker before the slot: waiting on a busy host while
+            # holding a slot could starve a parked worker that wants it back
+            job = await dispatcher.next_async()
+            if job is None:
+                return
+            async with semaphore:
+                try:
+                    success = await process_broker_async(job, pool, options)
+                    if not success:
+                        print(f"Failed to process {job['label']}")
+                except Exception as e:
+                    print(f"Exception processing {job['label']}: {e}")
+                finally:
+                    dispatcher.done(job)
+                await recycle_browsers(pool, options)
+
+    modes = {runs_headless(job["config"], options) for job in jobs}
+    async with warm.async_pool(browsers, modes) if warm else AsyncBrowserPool(
+        size=browsers, modes=modes
+    ) as pool:
+        for _ in range(parallel):
+            spawn_worker()
+        # Parked workers may spawn more while we wait, so keep going until none are left
+        while not all(task.done() for task in workers):
+            await asyncio.gather(*workers)
+    prompts.stop()
+
+
+def process_brokers_in_parallel(jobs, parallel, pool, options):
     """Process multiple brokers in parallel using thread pool"""
-    with concurrent.futures.ThreadPoolExecutor(max_workers=parallel) as executor:
-        # Submit all tasks to the executor
-        future_to_config = {
-            executor.submit(process_broker_thread, config, data): config
-            for config in configs
-        }
-        
-        # Process results as they complete
-        for future in concurrent.futures.as_completed(future_to_config):
-            config = future_to_config[future]
+    dispatcher = Dispatcher(jobs, options["host_rate"], options["host_burst"])
+    remaining = threading.Semaphore(0)
+
+    # At most `parallel` workers run automated steps at once. A worker waiting
+    # on a human gives its slot back and a fresh worker is started to use it.
+    slots = threading.Semaphore(parallel)
+
+    def worker():
+        # Each worker keeps one driver attached to the pool for its whole life
+        try:
+            while True:
+                # Take the broker before the slot: waiting on a busy host while
+                # holding a slot could starve a parked worker that wants it back
+                job = dispatcher.next()
+                if job is None:
+                    return
+                with slots:
+                    try:
+                        success = process_broker(job, pool, options)
+                        if not success:
+                            print(f"Failed to process {job['label']}")
+                    except Exception as e:
+                        print(f"Exception processing {job['label']}: {e}")
+                    finally:
+                        dispatcher.done(job)
+                        remaining.release()
+        finally:
+            pool.release_thread()
+
+    # While a broker waits on a human or a long wait, the next one is loaded
+    # ahead of time by a prefetcher, as far as the memory budget allows. Pages
+    # can't change threads, so the prefetcher finishes the broker itself.
+    budget = options["prefetch"]
+
+    def prefetcher():
+        try:
+            job = dispatcher.next_nowait()
+            if job is None:
+                return
             try:
-                success = future.result()
+                success = process_broker(job, pool, options, gate=slots)
                 if not success:
-                    print(f"Failed to process {config['name']}")
+                    print(f"Failed to process {job['label']}")
             except Exception as e:
-                print(f"Exception processing {config['name']}: {e}")
+                print(f"Exception processing {job['label']}: {e}")
+            finally:
+                dispatcher.done(job)
+                remaining.release()
+        finally:
+            budget.release()
+            pool.release_thread()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+
+        def spawn_worker():
+            if dispatcher.has_pending():
+                executor.submit(worker)
+
+        def spawn_prefetcher():
+            if budget and dispatcher.has_pending() and budget.acquire(blocking=False):
+                executor.submit(prefetcher)
+
+        def on_park():
+            spawn_worker()
+            spawn_prefetcher()
+
+        with PromptBroker(
+            slots=slots,
+            on_park=on_park,
+            auto_answer=options["auto_answer"],
+            answer=options["answer"],
+        ) as prompts:
+            options = dict(options, prompts=prompts, on_idle=spawn_prefetcher)
+            for _ in range(parallel):
+                executor.submit(worker)
+            # Wait for every broker before the executor stops accepting workers.
+            # Browsers can only be relaunched from this thread, which started them.
+            for _ in jobs:
+                while not remaining.acquire(timeout=1):
+                    recycle_browsers(pool, options)
+                recycle_browsers(pool, options)
 
 
 if __name__ == "__main__":
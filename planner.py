@@ -0,0 +1,89 @@
+from registry import STEP_SCHEMA
+
+
+# Steps that act on the current page, so a navigate has to come first
+PAGE_ACTIONS = set(STEP_SCHEMA) - {"navigate", "wait", "prompt_user_to_select_record"}
+
+
+def step_fields(step):
+    """Keys of the identity's data a step reads"""
+    action = step["action"]
+    if action == "fill":
+        return [step["field"]]
+    if action == "fill_full_name":
+        return ["full_name_reversed" if step.get("format") == "reversed" else "full_name"]
+    if action == "select_state":
+        # state_abbr is only used when present, with state as the fallback
+        return ["state"]
+    if action == "select" and not any(key in step for key in ("value", "label", "index")):
+        return [step["field"]]
+    return []
+
+
+def check_broker(config, data, start=0):
+    """Reasons a broker can't succeed for this data, or an empty list.
+
+    Checks `required_fields` and the fields the steps from `start` on read,
+    and steps that would act on a blank page before the first navigate.
+    Steps after the first one that is bound to fail are reported as never
+    reached.
+    """
+    problems = [
+        f"missing required field '{field}'"
+        for field in config.get("required_fields", [])
+        if not data.get(field)
+    ]
+    steps = config["steps"]
+    navigated = start > 0
+    for index in range(start, len(steps)):
+        action = steps[index]["action"]
+        failure = None
+        if action in PAGE_ACTIONS and not navigated:
+            failure = f"step {index} ({action}) comes before any navigate"
+        missing = [field for field in step_fields(steps[index]) if not data.get(field)]
+        if missing:
+            failure = f"step {index} ({action}) needs '{missing[0]}', which is missing"
+        if failure:
+            problems.append(failure)
+            if index + 2 == len(steps):
+                problems.append(f"step {index + 1} is never reached")
+            elif index + 2 < len(steps):
+                problems.append(f"steps {index + 1}-{len(steps) - 1} are never reached")
+            break
+        navigated = navigated or action == "navigate"
+    return problems
+
+
+def step_counts(config, start=0):
+    """Navigations, fixed wait seconds and prompts in a broker's steps from start"""
+    steps = config["steps"][start:]
+    return {
+        "navigations": sum(1 for step in steps if step["action"] == "navigate"),
+        "wait_seconds": sum(step["seconds"] for step in steps if step["action"] == "wait"),
+        "prompts": sum(
+            1 for step in steps if step["action"] == "prompt_user_to_select_record"
+        ),
+    }
+
+
+def print_plan(jobs, costs):
+    """Print the brokers a run would process, in the order it would start them"""
+    totals = {"navigations": 0, "wait_seconds": 0, "prompts": 0}
+    print(f"Plan for {len(jobs)} brokers:")
+    for position, job in enumerate(jobs, 1):
+        counts = step_counts(job["config"], job["start"])
+        for key, value in counts.items():
+            totals[key] += value
+        details = [
+            f"~{costs[job['config']['slug']]:.0f}s",
+            f"{counts['navigations']} navigation(s)",
+            f"{counts['wait_seconds']:g}s fixed waits",
+            f"{counts['prompts']} prompt(s)",
+        ]
+        if job["start"]:
+            details.append(f"from step {job['start']}")
+        print(f"{position:4}. {job['label']}: {', '.join(details)}")
+    print(
+        f"Total: {totals['navigations']} navigations, "
+        f"{totals['wait_seconds']:g}s of fixed waits, {totals['prompts']} prompts"
+    )
@@ -0,0 +1,35 @@
+import threading
+
+from forms import FORM_ACTIONS
+
+
+# Steps a broker may run ahead of getting a worker slot: they load the page
+# and fill in the form, but never submit anything or need the operator
+PREFETCH_ACTIONS = FORM_ACTIONS | {
+    "navigate",
+    "wait_for_selector",
+    "wait_for_url",
+    "wait_for_network_idle",
+    "wait_for_response",
+}
+
+# Rough memory cost of one prefetched page, counted against --prefetch-mb
+PAGE_MEMORY_MB = 60
+
+# Fixed waits at least this long are worth prefetching the next broker during
+LONG_WAIT = 3.0
+
+
+def prefetch_end(config, start):
+    """Index of the first step at or after start that must not run ahead"""
+    steps = config["steps"]
+    index = start
+    while index < len(steps) and steps[index]["action"] in PREFETCH_ACTIONS:
+        index += 1
+    return index
+
+
+def prefetch_budget(megabytes):
+    """A semaphore with one permit per prefetched page the budget allows, or None"""
+    pages = megabytes // PAGE_MEMORY_MB
+    return threading.BoundedSemaphore(pages) if pages > 0 else None
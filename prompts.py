@@ -0,0 +1,154 @@
+import asyncio
+import queue
+import threading
+
+from waits import POLL_MS, pump_until
+
+
+def ask_console(name, description):
+    """Ask the operator on this console to pick the record; EOFError if stdin is closed"""
+    print(f"\n[{name}] {description}")
+    print(f">> Please select the correct record manually in the browser for {name}.")
+    input(f"Press Enter once done with {name}...")
+
+
+class Ticket:
+    """A request for a human to finish something in a broker's browser page"""
+
+    def __init__(self, name, description, callback=None):
+        self.name = name
+        self.description = description
+        self.error = None
+        self._callback = callback
+        self._done = threading.Event()
+
+    def resolve(self, error=None):
+        """Mark the ticket handled, or failed with error if nobody could handle it"""
+        self.error = error
+        self._done.set()
+        if self._callback:
+            self._callback(error)
+
+    def wait(self, timeout=None):
+        """True once handled, False if timeout ran out first; raises the ticket's error"""
+        if not self._done.wait(timeout):
+            return False
+        if self.error:
+            raise self.error
+        return True
+
+
+class PromptBroker:
+    """Serve human-in-the-loop prompts from every worker through one console.
+
+    Workers post a ticket and wait for it instead of reading stdin themselves,
+    so parallel workers never fight over the terminal. While a worker waits it
+    gives its slot back, letting automated brokers keep running; on_park is
+    called at that point so the engine can start another worker if needed.
+    With auto_answer every prompt is answered at once, for unattended runs.
+    answer handles one ticket, raising EOFError when nobody can; it asks on
+    this console unless a daemon job forwards tickets to its client instead.
+    """
+
+    def __init__(self, slots=None, on_park=None, auto_answer=False, answer=None):
+        self.slots = slots
+        self.on_park = on_park
+        self.auto_answer = auto_answer
+        self.answer = answer or (lambda ticket: ask_console(ticket.name, ticket.description))
+        self._tickets = queue.Queue()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread:
+            self._tickets.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, name, description, callback=None):
+        """Queue a ticket for the console and return it"""
+        ticket = Ticket(name, description, callback)
+        self._tickets.put(ticket)
+        print(f"{name} is waiting for you ({self._tickets.qsize()} in the prompt queue)")
+        return ticket
+
+    def ask(self, name, description, page=None):
+        """Post a ticket and block the calling thread until it is handled.
+
+        Given the broker's page, its events keep being dispatched while the
+        thread waits, so route handlers serve the requests the operator's
+        clicks make instead of stalling them.
+        """
+        if self.auto_answer:
+            print(f"Auto-answered prompt for {name}")
+            return
+        ticket = self.submit(name, description)
+        if self.slots:
+            self.slots.release()
+        if self.on_park:
+            self.on_park()
+        try:
+            if page is None:
+                ticket.wait()
+            else:
+                pump_until(page, lambda: ticket.wait(0))
+        finally:
+            if self.slots and page is None:
+                self.slots.acquire()
+            elif self.slots:
+                pump_until(page, lambda: self.slots.acquire(timeout=POLL_MS / 1000))
+
+    async def ask_async(self, name, description):
+        """Post a ticket and suspend the calling task until it is handled"""
+        if self.auto_answer:
+            print(f"Auto-answered prompt for {name}")
+            return
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+
+        def finish(error):
+            if error:
+                loop.call_soon_threadsafe(done.set_exception, error)
+            else:
+                loop.call_soon_threadsafe(done.set_result, None)
+
+        self.submit(name, description, finish)
+        if self.slots:
+            self.slots.release()
+        if self.on_park:
+            self.on_park()
+        try:
+            await done
+        finally:
+            if self.slots:
+                await self.slots.acquire()
+
+    def _serve(self):
+        # The only place that reads stdin; tickets are handled one at a time
+        closed = False
+        while True:
+            ticket = self._tickets.get()
+            if ticket is None:
+                return
+            if not closed:
+                try:
+                    self.answer(ticket)
+                    ticket.resolve()
+                    continue
+                except EOFError:
+                    print()
+                    closed = True
+            # Nobody can pick the record, so the broker must not count as done
+            ticket.resolve(
+                RuntimeError("no console input to answer the prompt; use --auto-answer for unattended runs")
+            )
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+
+from resources import BLOCK_CHOICES
+
+
+CACHE_VERSION = 3
+
+# Keys every step of a given action must provide
+STEP_SCHEMA = {
+    "navigate": ["url"],
+    "fill": ["selector", "field"],
+    "fill_full_name": ["selector"],
+    "click": ["selector"],
+    "select": ["selector"],
+    "select_state": ["selector"],
+    "wait": ["seconds"],
+    "wait_for_selector": ["selector"],
+    "wait_for_url": [],
+    "wait_for_network_idle": [],
+    "wait_for_response": ["url"],
+    "prompt_user_to_select_record": ["description"],
+}
+
+# Top-level keys every broker config must provide
+BROKER_SCHEMA = ["name", "slug", "steps"]
+
+
+def validate_config(config):
+    """Check a parsed broker config against the schema and return a list of errors"""
+    if not isinstance(config, dict):
+        return ["config is not a mapping"]
+
+    errors = [f"missing '{key}'" for key in BROKER_SCHEMA if key not in config]
+    if not isinstance(config.get("steps", []), list):
+        errors.append("'steps' must be a list")
+        return errors
+    if not isinstance(config.get("required_fields", []), list):
+        errors.append("'required_fields' must be a list")
+    for key in ("max_concurrency", "min_interval", "recheck_after_days"):
+        value = config.get(key)
+        if value is not None and (not isinstance(value, (int, float)) or value < 0):
+            errors.append(f"'{key}' must be a non-negative number")
+    if not isinstance(config.get("batch_fill", True), bool):
+        errors.append("'batch_fill' must be true or false")
+    if "block" in config:
+        block = config["block"]
+        if not isinstance(block, list) or not set(block) <= BLOCK_CHOICES:
+            errors.append(f"'block' must be a list drawn from: {', '.join(sorted(BLOCK_CHOICES))}")
+
+    for index, step in enumerate(config.get("steps", [])):
+        if not isinstance(step, dict) or "action" not in step:
+            errors.append(f"step {index}: missing 'action'")
+            continue
+        action = step["action"]
+        if action not in STEP_SCHEMA:
+            errors.append(f"step {index}: unknown action '{action}'")
+            continue
+        for key in STEP_SCHEMA[action]:
+            if key not in step:
+                errors.append(f"step {index} ({action}): missing '{key}'")
+        if action == "select" and not any(
+            key in step for key in ("value", "label", "index", "field")
+        ):
+            errors.append(f"step {index} (select): needs one of value, label, index or field")
+    return errors
+
+
+def load_skip_list(skip_file):
+    """Read broker slugs to skip, one per line, ignoring comments"""
+    if not os.path.exists(skip_file):
+        return set()
+    with open(skip_file, "r") as f:
+        return {
+            line.strip() for line in f if line.strip() and not line.startswith("#")
+        }
+
+
+def _file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+class BrokerRegistry:
+    """Slug-indexed view of the broker configs with a compiled on-disk cache.
+
+    Each YAML file is parsed and validated once. The result is kept in a
+    compact JSON cache keyed by file name and reused until the file's mtime
+    and size change and its content hash no longer matches, so a normal
+    startup does not touch the YAML parser at all.
+    """
+
+    def __init__(self, broker_dir, cache_path):
+        self.broker_dir = broker_dir
+        self.cache_path = cache_path
+        self.errors = {}
+        self._by_slug = {}
+        self._load()
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_path, "r") as f:
+                cache = json.load(f)
+            if cache.get("version") == CACHE_VERSION:
+                return cache["entries"]
+        except (OSError, ValueError, KeyError):
+            pass
+        return {}
+
+    def _write_cache(self, entries):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = f"{self.cache_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(
+                    {"version": CACHE_VERSION, "entries": entries},
+                    f,
+                    separators=(",", ":"),
+                )
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Warning: Could not write broker cache: {e}")
+
+    def _compile(self, path, stat, digest):
+        # Only reached on a cache miss, so the YAML parser is imported here
+        import yaml
+
+        try:
+            with open(path, "r") as f:
+                config = yaml.safe_load(f)
+            errors = validate_config(config)
+        except yaml.YAMLError as e:
+            config, errors = None, [f"could not parse YAML: {e}"]
+        return {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "hash": digest,
+            "errors": errors,
+            "config": config,
+        }
+
+    def _load(self):
+        cached = self._read_cache()
+        entries = {}
+        dirty = False
+
+        for filename in sorted(os.listdir(self.broker_dir)):
+            if not filename.endswith(".yaml"):
+                continue
+            path = os.path.join(self.broker_dir, filename)
+            stat = os.stat(path)
+            entry = cached.get(filename)
+
+            if not entry or (entry["mtime_ns"], entry["size"]) != (
+                stat.st_mtime_ns,
+                stat.st_size,
+            ):
+                # Touched files whose content is unchanged keep their compiled form
+                digest = _file_hash(path)
+                if entry and entry["hash"] == digest:
+                    entry = dict(entry, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+                else:
+                    entry = self._compile(path, stat, digest)
+                dirty = True
+            entries[filename] = entry
+
+            if entry["errors"]:
+                self.errors[filename] = entry["errors"]
+                continue
+            slug = entry["config"]["slug"]
+            if slug in self._by_slug:
+                self.errors[filename] = [f"duplicate slug '{slug}'"]
+                continue
+            self._by_slug[slug] = entry["config"]
+
+        if dirty or entries.keys() != cached.keys():
+            self._write_cache(entries)
+
+    def slugs(self):
+        """All valid broker slugs, in file name order"""
+        return list(self._by_slug)
+
+    def __contains__(self, slug):
+        return slug in self._by_slug
+
+    def __len__(self):
+        return len(self._by_slug)
+
+    def get(self, slug):
+        """Return the validated config for a slug"""
+        return self._by_slug[slug]
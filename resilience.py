@@ -0,0 +1,146 @@
+import json
+import os
+import random
+import threading
+import time
+
+
+# Failure kinds worth another attempt, and those that say the site itself is unwell
+TRANSIENT = {"navigation_timeout", "network_error", "http_5xx"}
+SITE_FAILURES = TRANSIENT
+
+CAPTCHA_SELECTOR = ", ".join(
+    [
+        'iframe[src*="recaptcha"]',
+        'iframe[src*="hcaptcha"]',
+        'iframe[src*="challenges.cloudflare.com"]',
+        ".g-recaptcha",
+        ".h-captcha",
+        "#challenge-form",
+    ]
+)
+
+
+class SiteError(Exception):
+    """A broker page answered with a server error"""
+
+    def __init__(self, status, url):
+        super().__init__(f"HTTP {status} from {url}")
+        self.status = status
+
+
+class StepError(Exception):
+    """A step failed; remembers where, so a retry can restart close to it"""
+
+    def __init__(self, index, action, cause):
+        super().__init__(f"step {index} ({action}) failed: {cause}")
+        self.index = index
+        self.action = action
+        self.cause = cause
+        self.kind = "other"
+
+
+def check_response(response, url):
+    """Raise SiteError for a 5xx navigation response"""
+    if response is not None and response.status >= 500:
+        raise SiteError(response.status, url)
+
+
+def detect_captcha(page):
+    try:
+        return page.locator(CAPTCHA_SELECTOR).count() > 0
+    except Exception:
+        return False
+
+
+async def detect_captcha_async(page):
+    try:
+        return await page.locator(CAPTCHA_SELECTOR).count() > 0
+    except Exception:
+        return False
+
+
+def classify(error, captcha=False):
+    """Name the kind of failure behind a StepError"""
+    if captcha:
+        return "captcha"
+    cause = error.cause
+    if isinstance(cause, SiteError):
+        return "http_5xx"
+    if type(cause).__name__ == "TimeoutError":
+        if error.action in ("navigate", "wait_for_url", "wait_for_network_idle"):
+            return "navigation_timeout"
+        return "selector_missing"
+    if "net::ERR_" in str(cause):
+        return "network_error"
+    return "other"
+
+
+def retry_delay(attempt, base=2.0, cap=30.0):
+    """Exponential backoff with full jitter, in seconds"""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+def restart_point(config, index):
+    """Index of the latest navigate step at or before index, or 0"""
+    steps = config["steps"]
+    for candidate in range(min(index, len(steps) - 1), -1, -1):
+        if steps[candidate]["action"] == "navigate":
+            return candidate
+    return 0
+
+
+class CircuitBreaker:
+    """Stop visiting a broker site after repeated failures until a cooldown ends.
+
+    State is kept per site in a small JSON file so a site that is down stops
+    costing a browser context on every run, not just within one run.
+    """
+
+    def __init__(self, path, threshold=3, cooldown=3600):
+        self.path = path
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._state = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    self._state = json.load(f)
+            except (OSError, ValueError):
+                self._state = {}
+
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "w") as f:
+                json.dump(self._state, f, indent=2)
+        except OSError as e:
+            print(f"Warning: Could not save circuit breaker state: {e}")
+
+    def open_until(self, site):
+        """Time the site's circuit stays open until, or None if it is closed"""
+        with self._lock:
+            until = self._state.get(site, {}).get("open_until", 0)
+        return until if until > time.time() else None
+
+    def allow(self, site):
+        return self.open_until(site) is None
+
+    def record_success(self, site):
+        with self._lock:
+            if self._state.pop(site, None) is not None:
+                self._save()
+
+    def record_failure(self, site):
+        with self._lock:
+            entry = self._state.setdefault(site, {"failures": 0, "open_until": 0})
+            entry["failures"] += 1
+            if entry["failures"] >= self.threshold:
+                entry["open_until"] = time.time() + self.cooldown
+                print(
+                    f"Circuit open for {site} after {entry['failures']} consecutive failures"
+                )
+            self._save()
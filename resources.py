@@ -0,0 +1,131 @@
+import ipaddress
+from urllib.parse import urlparse
+
+
+# Playwright resource types that can be blocked, plus third_party
+RESOURCE_TYPES = {
+    "stylesheet",
+    "image",
+    "media",
+    "font",
+    "script",
+    "texttrack",
+    "xhr",
+    "fetch",
+    "eventsource",
+    "websocket",
+    "manifest",
+    "other",
+}
+BLOCK_CHOICES = RESOURCE_TYPES | {"third_party"}
+
+# Second-level labels that country code TLDs register names under, as in
+# example.co.uk or example.com.au
+SECOND_LEVEL_LABELS = {"ac", "co", "com", "edu", "gov", "ltd", "me", "net", "or", "org", "plc"}
+
+
+def parse_block_list(value):
+    """Turn a comma separated --block value into a set, rejecting unknown names"""
+    names = {name.strip() for name in (value or "").split(",") if name.strip()}
+    unknown = names - BLOCK_CHOICES
+    if unknown:
+        raise ValueError(
+            f"Unknown resource type(s): {', '.join(sorted(unknown))}. "
+            f"Choose from: {', '.join(sorted(BLOCK_CHOICES))}"
+        )
+    return names
+
+
+def resource_policy(config, run_block):
+    """The set of resources to block for a broker.
+
+    A broker's own `block` list replaces the run-wide one, so a broker that
+    needs images (e.g. for a captcha) can opt out with `block: []`.
+    """
+    if "block" in config:
+        return set(config["block"]) & BLOCK_CHOICES
+    return set(run_block)
+
+
+def site_of(url):
+    """Registrable part of a URL's host, e.g. infotracer.com for www.infotracer.com.
+
+    IP addresses and single-label hosts are kept whole. Country suffixes with a
+    generic second level, such as co.uk or com.au, keep one label more.
+    """
+    host = (urlparse(url).hostname or "").rstrip(".")
+    try:
+        ipaddress.ip_address(host)
+        return host
+    except ValueError:
+        pass
+    labels = host.split(".")
+    keep = 2
+    if len(labels) > 2 and len(labels[-1]) == 2 and labels[-2] in SECOND_LEVEL_LABELS:
+        keep = 3
+    return ".".join(labels[-keep:])
+
+
+def broker_site(config):
+    """The site a broker's opt-out flow lives on"""
+    url = config.get("url")
+    if not url:
+        url = next(
+            (step["url"] for step in config["steps"] if step["action"] == "navigate"),
+            "",
+        )
+    return site_of(url)
+
+
+def should_block(request, policy, site):
+    """Decide whether a request falls under a broker's resource policy"""
+    # Never block the pages themselves, only what they pull in
+    if request.resource_type == "document" and request.frame.parent_frame is None:
+        return False
+    if request.resource_type in policy:
+        return True
+    if "third_party" in policy and site:
+        host = urlparse(request.url).hostname or ""
+        return host != site and not host.endswith("." + site)
+    return False
+
+
+def apply_resource_policy(context, config, run_block, cache=None):
+    """Install request routing on a context to enforce the broker's policy.
+
+    Requests that get through are answered from `cache` (an HttpCache) when
+    it can handle them. Playwright allows one effective handler per request,
+    so blocking and caching share this one route.
+    """
+    policy = resource_policy(config, run_block)
+    if not policy and not cache:
+        return
+    site = broker_site(config)
+
+    def handle(route):
+        if should_block(route.request, policy, site):
+            route.abort()
+        elif cache and cache.handles(route.request):
+            cache.serve(route)
+        else:
+            route.continue_()
+
+    context.route("**/*", handle)
+
+
+async def apply_resource_policy_async(context, config, run_block, cache=None):
+    """Async counterpart of apply_resource_policy"""
+    policy = resource_policy(config, run_block)
+    if not policy and not cache:
+        return
+    site = broker_site(config)
+
+    async def handle(route):
+        if should_block(route.request, policy, site):
+            await route.abort()
+        elif cache and cache.handles(route.request):
+            await cache.serve_async(route)
+        else:
+            await route.continue_()
+
+    await context.route("**/*", handle)
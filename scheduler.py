@@ -0,0 +1,237 @@
+import asyncio
+import heapq
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+
+from resources import broker_site
+from telemetry import percentile, read_events
+
+
+# Rough costs in seconds used when a broker has no recorded history
+STEP_COST = 1.0
+NAVIGATE_COST = 3.0
+PROMPT_COST = 30.0
+
+# Number of recent successful runs per broker to estimate from
+HISTORY_RUNS = 5
+
+
+def history_path(telemetry_path):
+    """Where the compact duration summary for a telemetry log is kept"""
+    return f"{telemetry_path}.history.json"
+
+
+def load_history(telemetry_path):
+    """Recent successful run durations per broker slug.
+
+    Read from the summary written after each run. The telemetry log itself
+    is only scanned when the summary is missing or older than the log, e.g.
+    after a run that was killed before it could write the summary.
+    """
+    summary = history_path(telemetry_path)
+    try:
+        if os.path.getmtime(summary) >= os.path.getmtime(telemetry_path):
+            with open(summary, "r") as f:
+                return {
+                    slug: deque(runs, maxlen=HISTORY_RUNS) for slug, runs in json.load(f).items()
+                }
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    history = {}
+    for event in read_events(telemetry_path):
+        if event.get("type") == "broker" and event.get("outcome") == "ok":
+            runs = history.setdefault(event["broker"], deque(maxlen=HISTORY_RUNS))
+            runs.append(event["duration"])
+    return history
+
+
+def save_history(telemetry_path, history, durations):
+    """Add a run's broker durations to the history and write its summary"""
+    for slug, runs in durations.items():
+        history.setdefault(slug, deque(maxlen=HISTORY_RUNS)).extend(runs)
+    summary = history_path(telemetry_path)
+    try:
+        tmp_path = f"{summary}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({slug: list(runs) for slug, runs in history.items()}, f)
+        os.replace(tmp_path, summary)
+    except OSError as e:
+        print(f"Warning: Could not write broker history: {e}")
+
+
+def needs_human(config):
+    """True if a broker has a step that waits for the operator"""
+    return any(
+        step["action"] == "prompt_user_to_select_record" for step in config["steps"]
+    )
+
+
+def overdue_by(config, completed_at, now):
+    """Seconds a processed broker is past its recheck_after_days, or None if not due"""
+    days = config.get("recheck_after_days")
+    if days is None:
+        return None
+    if completed_at is None:
+        return math.inf
+    overdue = (now - completed_at).total_seconds() - days * 86400
+    return overdue if overdue >= 0 else None
+
+
+def static_cost(config):
+    """Estimate a broker's duration from its steps alone"""
+    cost = 0.0
+    for step in config["steps"]:
+        action = step["action"]
+        if action == "wait":
+            cost += step["seconds"]
+        elif action == "navigate":
+            cost += NAVIGATE_COST
+        elif action == "prompt_user_to_select_record":
+            cost += PROMPT_COST
+        else:
+            cost += STEP_COST
+    return cost
+
+
+def estimate_costs(configs, history):
+    """Expected seconds per broker slug, preferring the median of past runs"""
+    costs = {}
+    for config in configs:
+        runs = history.get(config["slug"])
+        costs[config["slug"]] = percentile(runs, 50) if runs else static_cost(config)
+    return costs
+
+
+def estimate_makespan(jobs, costs, workers):
+    """Simulate greedy list scheduling to estimate how long the run will take"""
+    finish_times = [0.0] * max(1, workers)
+    for job in jobs:
+        earliest = heapq.heappop(finish_times)
+        heapq.heappush(finish_times, earliest + costs[job["config"]["slug"]])
+    return max(finish_times)
+
+
+def schedule(jobs, costs):
+    """Order broker jobs longest-first, spreading out those that need a human.
+
+    Handing out the longest jobs first keeps one slow broker from dominating
+    the tail of the run. Brokers with a prompt are longest-first among
+    themselves but spaced evenly through the queue so the operator gets a
+    steady trickle of work rather than one burst followed by idle time.
+    """
+    by_cost = sorted(jobs, key=lambda job: -costs[job["config"]["slug"]])
+    human = [job for job in by_cost if needs_human(job["config"])]
+    automated = [job for job in by_cost if not needs_human(job["config"])]
+    if not human or not automated:
+        return by_cost
+
+    ordered = []
+    remaining = iter(automated)
+    total = len(human) + len(automated)
+    stride = total / len(human)
+    placed = 0
+    for position in range(total):
+        # The k-th human broker belongs at position k * stride
+        if placed < len(human) and position >= placed * stride:
+            ordered.append(human[placed])
+            placed += 1
+        else:
+            ordered.append(next(remaining))
+    return ordered
+
+
+class Dispatcher:
+    """Hand out brokers in schedule order while respecting per-host limits.
+
+    A broker only starts when its host has a free slot under the broker's
+    `max_concurrency`, its `min_interval` since the host's last start has
+    passed and the run-wide per-host token bucket has a token left. Until
+    then the next eligible broker in the queue is handed out instead.
+    """
+
+    def __init__(self, jobs, host_rate=None, host_burst=1):
+        self._pending = list(jobs)
+        self._cond = threading.Condition()
+        self._active = {}
+        self._last_start = {}
+        self._buckets = {}
+        self.host_rate = host_rate
+        self.host_burst = max(1, host_burst)
+
+    def has_pending(self):
+        with self._cond:
+            return bool(self._pending)
+
+    def _refill(self, host, now):
+        tokens, updated = self._buckets.get(host, (self.host_burst, now))
+        tokens = min(self.host_burst, tokens + (now - updated) * self.host_rate / 60)
+        self._buckets[host] = (tokens, now)
+        return tokens
+
+    def _wait_for(self, config, host, now):
+        # Seconds until the broker may start; inf if it waits on a running one
+        limit = config.get("max_concurrency")
+        if limit and self._active.get(host, 0) >= limit:
+            return math.inf
+        wait = 0.0
+        if config.get("min_interval") and host in self._last_start:
+            wait = self._last_start[host] + config["min_interval"] - now
+        if self.host_rate:
+            tokens = self._refill(host, now)
+            if tokens < 1:
+                wait = max(wait, (1 - tokens) * 60 / self.host_rate)
+        return wait
+
+    def _take(self):
+        # Returns (job, None) or (None, seconds to wait); (None, None) when done
+        now = time.monotonic()
+        shortest = None
+        for position, job in enumerate(self._pending):
+            host = broker_site(job["config"])
+            wait = self._wait_for(job["config"], host, now)
+            if wait <= 0:
+                del self._pending[position]
+                self._active[host] = self._active.get(host, 0) + 1
+                self._last_start[host] = now
+                if self.host_rate:
+                    tokens, updated = self._buckets[host]
+                    self._buckets[host] = (tokens - 1, updated)
+                return job, None
+            shortest = wait if shortest is None else min(shortest, wait)
+        return None, shortest
+
+    def next(self):
+        """Block until a broker job may start and return it, or None when all are handed out"""
+        with self._cond:
+            while True:
+                job, wait = self._take()
+                if job or wait is None:
+                    return job
+                self._cond.wait(None if wait == math.inf else wait)
+
+    def next_nowait(self):
+        """A broker job that may start right now, or None"""
+        with self._cond:
+            job, _ = self._take()
+            return job
+
+    async def next_async(self):
+        """Async counterpart of next; polls instead of blocking the event loop"""
+        while True:
+            with self._cond:
+                job, wait = self._take()
+            if job or wait is None:
+                return job
+            await asyncio.sleep(min(wait, 0.25))
+
+    def done(self, job):
+        """Mark a handed out broker job as finished, freeing its host slot"""
+        with self._cond:
+            host = broker_site(job["config"])
+            self._active[host] -= 1
+            self._cond.notify_all()
@@ -0,0 +1,252 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+
+# Identity fields stored for every profile
+PROFILE_FIELDS = ("first_name", "last_name", "email", "phone", "ssn", "zip", "city", "state")
+
+BACKENDS = ("json", "sqlite")
+DATABASE_NAME = "privotron.db"
+
+
+class JsonStore:
+    """Profiles as one JSON file each under profiles/ (the default backend).
+
+    Every update rewrites the whole file, so writes go through a temporary
+    file and an atomic rename; a crash or a concurrent reader never sees a
+    half-written profile. JSON profiles keep no run history.
+    """
+
+    def __init__(self, profiles_dir):
+        self.profiles_dir = profiles_dir
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        return os.path.join(self.profiles_dir, f"{name}.json")
+
+    def _read(self, name):
+        with open(self._path(name), "r") as f:
+            return json.load(f)
+
+    def _write(self, name, user_data):
+        path = self._path(name)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(user_data, f, indent=2)
+        os.replace(temp_path, path)
+
+    def close(self):
+        pass
+
+    def names(self):
+        """Names of every saved profile"""
+        return sorted(
+            filename[: -len(".json")]
+            for filename in os.listdir(self.profiles_dir)
+            if filename.endswith(".json")
+        )
+
+    def load(self, name):
+        """A profile's fields and processed_brokers, or None if it doesn't exist"""
+        if not os.path.exists(self._path(name)):
+            return None
+        return self._read(name)
+
+    def save(self, name, fields, completed=None):
+        """Create or replace a profile, including its processed_brokers"""
+        user_data = {key: fields.get(key) for key in PROFILE_FIELDS}
+        user_data["processed_brokers"] = sorted(set(fields.get("processed_brokers", [])))
+        processed_at = fields.get("processed_at", {})
+        user_data["processed_at"] = {
+            slug: processed_at[slug]
+            for slug in user_data["processed_brokers"]
+            if slug in processed_at
+        }
+        user_data["last_updated"] = datetime.now().isoformat()
+        with self._lock:
+            self._write(name, user_data)
+
+    def mark_processed(self, name, slugs):
+        """Add completed broker slugs to a profile; returns how many were new"""
+        with self._lock:
+            # Reload the profile in case it was modified elsewhere
+            user_data = self._read(name) if os.path.exists(self._path(name)) else {}
+            current = set(user_data.get("processed_brokers", []))
+            now = datetime.now().isoformat()
+            user_data["processed_brokers"] = sorted(current | set(slugs))
+            user_data.setdefault("processed_at", {}).update({slug: now for slug in slugs})
+            user_data["last_updated"] = now
+            self._write(name, user_data)
+        return len(set(slugs) - current)
+
+    def record_run(self, name, started, attempted, completed):
+        pass
+
+
+class SqliteStore:
+    """Profiles, per-broker processing records and run history in SQLite.
+
+    The database runs in WAL mode so readers never block the writer, and
+    every update is a single transaction of upserts: concurrent runs add
+    their brokers instead of overwriting each other's profile.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS profiles (
+        name TEXT PRIMARY KEY,
+        first_name TEXT, last_name TEXT, email TEXT, phone TEXT,
+        ssn TEXT, zip TEXT, city TEXT, state TEXT,
+        updated TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS processed (
+        profile TEXT NOT NULL,
+        broker TEXT NOT NULL,
+        completed TEXT NOT NULL,
+        PRIMARY KEY (profile, broker)
+    );
+    CREATE INDEX IF NOT EXISTS processed_broker ON processed (broker, completed);
+    CREATE TABLE IF NOT EXISTS runs (
+        id INTEGER PRIMARY KEY,
+        profile TEXT NOT NULL,
+        started TEXT NOT NULL,
+        finished TEXT NOT NULL,
+        attempted INTEGER NOT NULL,
+        completed INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS runs_profile ON runs (profile, started);
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(self.SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def names(self):
+        with self._lock:
+            rows = self._db.execute("SELECT name FROM profiles ORDER BY name").fetchall()
+        return [row["name"] for row in rows]
+
+    def load(self, name):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM profiles WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                return None
+            processed = self._db.execute(
+                "SELECT broker, completed FROM processed WHERE profile = ? ORDER BY broker",
+                (name,),
+            ).fetchall()
+        user_data = {key: row[key] for key in PROFILE_FIELDS}
+        user_data["processed_brokers"] = [record["broker"] for record in processed]
+        user_data["processed_at"] = {record["broker"]: record["completed"] for record in processed}
+        user_data["last_updated"] = row["updated"]
+        return user_data
+
+    def save(self, name, fields, completed=None):
+        now = datetime.now().isoformat()
+        values = [fields.get(key) for key in PROFILE_FIELDS]
+        slugs = set(fields.get("processed_brokers", []))
+        processed_at = fields.get("processed_at", {})
+        with self._lock, self._db:
+            self._db.execute(
+                f"INSERT INTO profiles (name, {', '.join(PROFILE_FIELDS)}, updated) "
+                f"VALUES (?, {', '.join('?' for _ in PROFILE_FIELDS)}, ?) "
+                f"ON CONFLICT (name) DO UPDATE SET "
+                f"{', '.join(f'{key} = excluded.{key}' for key in PROFILE_FIELDS)}, "
+                f"updated = excluded.updated",
+                (name, *values, now),
+            )
+            # Replace the processed set, keeping timestamps of brokers that stay
+            existing = {
+                row["broker"]
+                for row in self._db.execute(
+                    "SELECT broker FROM processed WHERE profile = ?", (name,)
+                )
+            }
+            self._db.executemany(
+                "DELETE FROM processed WHERE profile = ? AND broker = ?",
+                [(name, slug) for slug in existing - slugs],
+            )
+            self._db.executemany(
+                "INSERT OR IGNORE INTO processed (profile, broker, completed) VALUES (?, ?, ?)",
+                [(name, slug, processed_at.get(slug) or completed or now) for slug in slugs],
+            )
+
+    def mark_processed(self, name, slugs):
+        now = datetime.now().isoformat()
+        with self._lock, self._db:
+            existing = {
+                row["broker"]
+                for row in self._db.execute(
+                    "SELECT broker FROM processed WHERE profile = ?", (name,)
+                )
+            }
+            self._db.executemany(
+                "INSERT INTO processed (profile, broker, completed) VALUES (?, ?, ?) "
+                "ON CONFLICT (profile, broker) DO UPDATE SET completed = excluded.completed",
+                [(name, slug, now) for slug in slugs],
+            )
+            self._db.execute("UPDATE profiles SET updated = ? WHERE name = ?", (now, name))
+        return len(set(slugs) - existing)
+
+    def record_run(self, name, started, attempted, completed):
+        """Append one run of a profile to the run history"""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO runs (profile, started, finished, attempted, completed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (name, started, datetime.now().isoformat(), attempted, completed),
+            )
+
+
+def completion_times(user_data):
+    """When each processed broker of a profile last completed, as datetimes.
+
+    Profiles written before completion times were kept fall back to the
+    profile's last_updated time, or None when even that is missing.
+    """
+    processed_at = user_data.get("processed_at") or {}
+    fallback = user_data.get("last_updated")
+    times = {}
+    for slug in user_data.get("processed_brokers", []):
+        stamp = processed_at.get(slug) or fallback
+        try:
+            times[slug] = datetime.fromisoformat(stamp) if stamp else None
+        except ValueError:
+            times[slug] = None
+    return times
+
+
+def open_store(backend, profiles_dir):
+    """Open the profile store for a --state-backend choice"""
+    if backend == "sqlite":
+        return SqliteStore(os.path.join(profiles_dir, DATABASE_NAME))
+    return JsonStore(profiles_dir)
+
+
+def import_json_profiles(profiles_dir, store):
+    """Copy every JSON profile into another store; returns the names imported.
+
+    Brokers processed before completion times were recorded are stamped
+    with the profile's last_updated time instead.
+    """
+    source = JsonStore(profiles_dir)
+    imported = []
+    for name in source.names():
+        try:
+            user_data = source.load(name)
+        except (OSError, ValueError) as e:
+            print(f"Error reading profile {name}, skipping it: {e}")
+            continue
+        store.save(name, user_data, completed=user_data.get("last_updated"))
+        imported.append(name)
+    return imported
@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+
+# The log is rotated to a single `.1` file once it grows past this size
+MAX_TELEMETRY_BYTES = 50 * 2**20
+
+
+def navigation_bytes(response):
+    """Bytes received for a navigation's main document, if known"""
+    if response is None:
+        return None
+    sizes = response.request.sizes()
+    return sizes["responseHeadersSize"] + sizes["responseBodySize"]
+
+
+async def navigation_bytes_async(response):
+    """Async counterpart of navigation_bytes"""
+    if response is None:
+        return None
+    sizes = await response.request.sizes()
+    return sizes["responseHeadersSize"] + sizes["responseBodySize"]
+
+
+class Telemetry:
+    """Append one JSON object per step and per broker to a JSON-lines file.
+
+    Writes are serialised with a lock so threaded workers can share one
+    instance. With no path every call is a no-op. Successful broker
+    durations are also kept in `durations` for the scheduler's history.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.run_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        self._lock = threading.Lock()
+        self._file = None
+        self.durations = {}
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            if os.path.exists(path) and os.path.getsize(path) > MAX_TELEMETRY_BYTES:
+                os.replace(path, f"{path}.1")
+            self._file = open(path, "a")
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def record(self, event):
+        if not self._file:
+            return
+        event = dict(event, run=self.run_id)
+        line = json.dumps(event, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            if event["type"] == "broker" and event.get("outcome") == "ok":
+                self.durations.setdefault(event["broker"], []).append(event["duration"])
+
+    @contextmanager
+    def _timed(self, event):
+        start = time.time()
+        clock = time.monotonic()
+        event["outcome"] = "ok"
+        try:
+            yield event
+        except BaseException as e:
+            event["outcome"] = "error"
+            event["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            elapsed = time.monotonic() - clock
+            event["start"] = start
+            event["end"] = start + elapsed
+            event["duration"] = round(elapsed, 3)
+            self.record(event)
+
+    def broker(self, config):
+        """Time a whole broker run"""
+        return self._timed({"type": "broker", "broker": config["slug"]})
+
+    def step(self, config, index, step):
+        """Time one step; the yielded dict can carry extra fields such as bytes"""
+        return self._timed(
+            {
+                "type": "step",
+                "broker": config["slug"],
+                "index": index,
+                "action": step["action"],
+                "selector": step.get("selector"),
+            }
+        )
+
+
+def read_events(path):
+    """Yield the events in a telemetry file, skipping damaged lines"""
+    if not os.path.exists(path):
+        return
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    rank = max(1, round(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(path):
+    """Print per-broker and per-action latency plus prompt and sleep totals"""
+    brokers = {}
+    actions = {}
+    prompt_time = 0.0
+    sleep_time = 0.0
+    sleeps = 0
+    runs = set()
+
+    for event in read_events(path):
+        runs.add(event.get("run"))
+        if event.get("type") == "broker":
+            brokers.setdefault(event["broker"], []).append(event["duration"])
+        elif event.get("type") == "step":
+            actions.setdefault(event["action"], []).append(event["duration"])
+            if event["action"] == "prompt_user_to_select_record":
+                prompt_time += event["duration"]
+            elif event["action"] == "wait":
+                sleep_time += event["duration"]
+                sleeps += 1
+
+    if not brokers and not actions:
+        print(f"No telemetry recorded in {path}")
+        return
+
+    print(f"Telemetry from {len(runs)} run(s) in {path}")
+    for title, groups in (("Broker", brokers), ("Action", actions)):
+        print(f"\n{title:<32} {'count':>6} {'p50 (s)':>9} {'p95 (s)':>9}")
+        ordered = sorted(groups.items(), key=lambda item: -percentile(item[1], 95))
+        for name, durations in ordered:
+            print(
+                f"{name:<32} {len(durations):>6} "
+                f"{percentile(durations, 50):>9.2f} {percentile(durations, 95):>9.2f}"
+            )
+    print(f"\nTime waiting on human prompts: {prompt_time:.1f}s")
+    print(f"Time in fixed waits: {sleep_time:.1f}s across {sleeps} wait step(s)")
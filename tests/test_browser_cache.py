@@ -0,0 +1,116 @@
+import json
+import os
+import types
+
+import pytest
+
+import browser_cache
+from browser_cache import HttpCache, StorageStates
+
+URL = "https://cdn.example.com/app.js"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return HttpCache(str(tmp_path / "http"), max_bytes=10_000)
+
+
+class Route:
+    def __init__(self, url):
+        self.request = types.SimpleNamespace(url=url)
+        self.fulfilled = None
+
+    def fulfill(self, **response):
+        self.fulfilled = response
+
+
+def job(profile=None):
+    config = {"slug": "acme", "url": "https://www.acme.example.com/optout", "steps": []}
+    return {"config": config, "label": "acme", "profile": profile}
+
+
+def test_store_and_lookup(cache):
+    headers = {"cache-control": "max-age=60", "content-length": "5", "etag": "x"}
+    cache.store(URL, 200, headers, b"hello")
+    meta, body = cache.lookup(URL)
+    assert body == b"hello"
+    # Transfer headers are dropped; the replayed body is already decoded
+    assert meta["headers"] == {"cache-control": "max-age=60", "etag": "x"}
+    assert cache.lookup("https://cdn.example.com/other.js") is None
+
+
+def test_cookies_are_never_stored_or_replayed(cache):
+    headers = {"cache-control": "max-age=60", "Set-Cookie": "session=john"}
+    cache.store(URL, 200, headers, b"hello")
+    meta, _ = cache.lookup(URL)
+    assert meta["headers"] == {"cache-control": "max-age=60"}
+
+    # Entries written before cookies were stripped don't replay them either
+    meta_path = cache._paths(URL)[0]
+    with open(meta_path) as f:
+        meta = json.load(f)
+    meta["headers"]["set-cookie"] = "session=john"
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    route = Route(URL)
+    cache.serve(route)
+    assert route.fulfilled["headers"] == {"cache-control": "max-age=60"}
+
+
+@pytest.mark.parametrize(
+    "status, control",
+    [(404, ""), (200, "no-store"), (200, "private, max-age=60"), (200, "max-age=0")],
+)
+def test_uncacheable_responses_are_not_stored(cache, status, control):
+    cache.store(URL, status, {"cache-control": control}, b"hello")
+    assert cache.lookup(URL) is None
+
+
+def test_stale_entries_are_not_served(cache, monkeypatch):
+    cache.store(URL, 200, {"cache-control": "max-age=60"}, b"hello")
+    now = browser_cache.time.time()
+    monkeypatch.setattr(browser_cache.time, "time", lambda: now + 61)
+    assert cache.lookup(URL) is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = HttpCache(str(tmp_path), max_bytes=2_000)
+    for index in range(3):
+        url = f"https://cdn.example.com/{index}.js"
+        cache.store(url, 200, {}, b"x" * 500)
+        body_path = cache._paths(url)[1]
+        os.utime(body_path, (index, index))
+    # Reading the oldest entry makes it the most recent one
+    assert cache.lookup("https://cdn.example.com/0.js")
+    cache.store("https://cdn.example.com/3.js", 200, {}, b"x" * 500)
+    assert cache.lookup("https://cdn.example.com/1.js") is None
+    assert cache.lookup("https://cdn.example.com/0.js")
+    assert cache.lookup("https://cdn.example.com/3.js")
+    assert cache._size <= 2_000 * 0.9
+
+
+def test_size_survives_a_restart(cache):
+    cache.store(URL, 200, {}, b"hello")
+    assert HttpCache(cache.root, cache.max_bytes)._size == cache._size
+
+
+def test_only_static_gets_are_handled(cache):
+    def request(method, resource_type):
+        return types.SimpleNamespace(method=method, resource_type=resource_type)
+
+    assert cache.handles(request("GET", "script"))
+    assert not cache.handles(request("POST", "script"))
+    assert not cache.handles(request("GET", "document"))
+
+
+def test_storage_state_paths(tmp_path):
+    shared = StorageStates(str(tmp_path / "state"))
+    assert shared.path(job("john")) == str(tmp_path / "state" / "example.com.json")
+    assert shared.context_options(job()) == {}
+
+    isolated = StorageStates(str(tmp_path / "state"), per_profile=True)
+    path = isolated.path(job("john"))
+    assert path == str(tmp_path / "state" / "john" / "example.com.json")
+    open(path, "w").close()
+    assert isolated.context_options(job("john")) == {"storage_state": path}
+    assert isolated.context_options(job("jane")) == {}
@@ -0,0 +1,235 @@
+import asyncio
+import sys
+import threading
+import types
+
+import pytest
+
+from browser_pool import AsyncBrowserPool, BrowserPool
+from governor import BROWSER_MARKER
+
+
+class Browser:
+    def __init__(self, log, args):
+        self.log = log
+        self.args = args
+        self.connected = True
+
+    def new_context(self, **options):
+        return types.SimpleNamespace(close=lambda: None, options=options)
+
+    def is_connected(self):
+        return self.connected
+
+    def close(self):
+        self.connected = False
+        self.log.append(("close", self.args[-1]))
+
+
+class Driver:
+    def __init__(self, log):
+        self.log = log
+        self.chromium = self
+
+    def start(self):
+        self.log.append(("start", threading.get_ident()))
+        return self
+
+    def launch(self, headless, args):
+        return Browser(self.log, args)
+
+    def connect_over_cdp(self, endpoint):
+        self.log.append(("connect", endpoint))
+        return Browser(self.log, [endpoint])
+
+    def stop(self):
+        self.log.append(("stop", threading.get_ident()))
+
+
+@pytest.fixture
+def log(monkeypatch):
+    log = []
+    module = types.ModuleType("playwright.sync_api")
+    module.sync_playwright = lambda: Driver(log)
+    monkeypatch.setitem(sys.modules, "playwright", types.ModuleType("playwright"))
+    monkeypatch.setitem(sys.modules, "playwright.sync_api", module)
+    return log
+
+
+def test_pool_enters_and_exits(log):
+    with BrowserPool(size=2, modes={True, False}) as pool:
+        assert pool.is_connected()
+        with pool.context(headless=True) as context:
+            assert context is not None
+    markers = ("0.0", "1.0", "2.0", "3.0")
+    assert [event for event in log if event[0] == "close"] == [
+        ("close", f"{BROWSER_MARKER}{marker}") for marker in markers
+    ]
+    assert log[-1][0] == "stop"
+
+
+def test_contexts_go_to_the_least_busy_browser(log):
+    with BrowserPool(size=2) as pool:
+        with pool.context(), pool.context():
+            assert [entry["leases"] for entry in pool._browsers] == [1, 1]
+        assert [entry["leases"] for entry in pool._browsers] == [0, 0]
+
+
+def test_worker_threads_attach_over_cdp_and_release(log):
+    with BrowserPool(size=1) as pool:
+
+        def worker():
+            with pool.context():
+                pass
+            pool.release_thread()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+        connects = [event for event in log if event[0] == "connect"]
+        assert len(connects) == 1
+        # The worker's own driver was stopped, not the pool's
+        assert ("stop", thread.ident) in log
+
+
+def test_recycles_after_n_jobs_once_idle(log):
+    pool = BrowserPool(size=2).start()
+    for _ in range(2):
+        with pool.context():
+            pass
+    with pool.context():
+        pool.maintain(recycle_after=2)
+        # Still in use and browser 1 can take new contexts, so it's only marked
+        assert pool._browsers[0]["retire"]
+        assert pool._browsers[0]["marker"] == "0.0"
+    pool.maintain(recycle_after=2)
+    entry = pool._browsers[0]
+    assert (entry["marker"], entry["jobs"], entry["retire"]) == ("0.1", 0, False)
+    assert ("close", f"{BROWSER_MARKER}0.0") in log
+    pool.close()
+
+
+def test_last_browser_in_its_mode_is_replaced_while_it_drains(log):
+    pool = BrowserPool(size=1).start()
+    with pool.context():
+        pass
+    with pool.context():
+        pool.maintain(recycle_after=1)
+        # The replacement is up, but the old browser still has a context open
+        assert pool._browsers[0]["marker"] == "0.1"
+        assert pool._browsers[0]["leases"] == 0
+        assert ("close", f"{BROWSER_MARKER}0.0") not in log
+    pool.maintain()
+    assert ("close", f"{BROWSER_MARKER}0.0") in log
+    pool.close()
+
+
+def test_workers_wait_for_a_retired_browser_to_be_replaced(log):
+    pool = BrowserPool(size=1).start()
+    with pool.context():
+        pool._browsers[0]["retire"] = True
+
+        def worker():
+            with pool.context():
+                pass
+            pool.release_thread()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join(timeout=0.2)
+        # Only the starting thread can launch the replacement
+        assert thread.is_alive()
+        pool.maintain()
+        thread.join(timeout=5)
+        connects = [event for event in log if event[0] == "connect"]
+        assert connects == [("connect", pool._browsers[0]["endpoint"])]
+    pool.close()
+
+
+def test_recycles_above_memory_threshold(log):
+    governor = types.SimpleNamespace(
+        browser_rss=lambda marker: 500 if marker == "1.0" else 10
+    )
+    pool = BrowserPool(size=2).start()
+    pool.maintain(recycle_bytes=100, governor=governor)
+    assert [entry["marker"] for entry in pool._browsers] == ["0.0", "1.1"]
+    pool.close()
+
+
+class AsyncBrowser(Browser):
+    async def new_context(self, **options):
+        async def close():
+            self.log.append(("context closed", self.args[-1]))
+
+        return types.SimpleNamespace(close=close)
+
+    async def close(self):
+        Browser.close(self)
+
+
+class AsyncDriver(Driver):
+    async def start(self):
+        return self
+
+    async def launch(self, headless, args):
+        return AsyncBrowser(self.log, args)
+
+    async def stop(self):
+        self.log.append(("stop", None))
+
+
+@pytest.fixture
+def async_log(monkeypatch):
+    log = []
+    module = types.ModuleType("playwright.async_api")
+    module.async_playwright = lambda: AsyncDriver(log)
+    monkeypatch.setitem(sys.modules, "playwright", types.ModuleType("playwright"))
+    monkeypatch.setitem(sys.modules, "playwright.async_api", module)
+    return log
+
+
+def test_async_pool_enters_and_exits(async_log):
+    async def run():
+        async with AsyncBrowserPool(size=2) as pool:
+            async with pool.context(), pool.context():
+                assert [entry["leases"] for entry in pool._browsers] == [1, 1]
+
+    asyncio.run(run())
+    events = [event[0] for event in async_log]
+    assert events == ["context closed"] * 2 + ["close"] * 2 + ["stop"]
+
+
+def test_async_pool_recycles_and_closes(async_log):
+    async def run():
+        async with AsyncBrowserPool(size=1) as pool:
+            async with pool.context():
+                pass
+            await pool.maintain(recycle_after=1)
+            assert pool.is_connected()
+            assert pool._browsers[0]["marker"] == "0.1"
+
+    asyncio.run(run())
+    assert [event[1] for event in async_log if event[0] == "close"] == [
+        f"{BROWSER_MARKER}0.0",
+        f"{BROWSER_MARKER}0.1",
+    ]
+    assert async_log[-1] == ("stop", None)
+
+
+def test_async_pool_never_hands_out_a_retired_browser(async_log):
+    async def run():
+        async with AsyncBrowserPool(size=1) as pool:
+            async with pool.context():
+                pool._browsers[0]["retire"] = True
+                async with pool.context():
+                    assert pool._browsers[0]["marker"] == "0.1"
+                    assert pool._browsers[0]["leases"] == 1
+                # The old browser stays up until its last context is closed
+                assert ("close", f"{BROWSER_MARKER}0.0") not in async_log
+            await pool.maintain()
+
+    asyncio.run(run())
+    assert [event[1] for event in async_log if event[0] == "close"] == [
+        f"{BROWSER_MARKER}0.0",
+        f"{BROWSER_MARKER}0.1",
+    ]
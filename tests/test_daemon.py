@@ -0,0 +1,142 @@
+import http.client
+import io
+import json
+import threading
+from http.server import ThreadingHTTPServer
+
+import click
+import pytest
+
+import daemon as daemon_module
+from daemon import Daemon, DaemonHandler, Job, JobOutput, Warm, submit_to_daemon
+from prompts import PromptBroker, Ticket
+
+
+@click.command()
+@click.option("--fail", is_flag=True)
+@click.option("--prompt", is_flag=True)
+@click.pass_obj
+def command(warm, fail, prompt):
+    print(f"warm: {warm is not None}")
+    if fail:
+        raise click.ClickException("it broke")
+    if prompt:
+        with PromptBroker(answer=warm.job.answer_prompt) as prompts:
+            try:
+                prompts.ask("InfoTracer", "pick the record")
+            except RuntimeError as e:
+                raise click.ClickException(str(e))
+        print("picked")
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    """A daemon serving the API and running jobs, as Daemon.run does"""
+    daemon = Daemon(command, str(tmp_path / "daemon.json"))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DaemonHandler)
+    server.daemon_threads = True
+    server.daemon = daemon
+    server.token = "secret"
+    daemon._write_state(server.server_address[1], server.token)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def work():
+        while True:
+            job = daemon._queue.get()
+            if job is None:
+                return
+            daemon._run(job)
+
+    worker = threading.Thread(target=work, daemon=True)
+    worker.start()
+    yield daemon
+    daemon._queue.put(None)
+    worker.join()
+    server.shutdown()
+
+
+def test_jobs_stream_their_output_and_exit_code(daemon, capsys):
+    assert submit_to_daemon(daemon.state_path, []) == 0
+    assert submit_to_daemon(daemon.state_path, ["--fail"]) == 1
+    out = capsys.readouterr().out
+    assert "warm: True" in out
+    assert "Error: it broke" in out
+    assert sorted(job.status for job in daemon.jobs.values()) == ["done", "failed"]
+
+
+def test_requests_need_the_token(daemon):
+    with open(daemon.state_path) as f:
+        port = json.load(f)["port"]
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    headers = {"Authorization": "Bearer wrong"}
+    connection.request("POST", "/jobs", body="{}", headers=headers)
+    assert connection.getresponse().status == 401
+
+
+def test_prompts_are_answered_on_the_client_console(daemon, monkeypatch, capsys):
+    monkeypatch.setattr("sys.stdin", io.StringIO("\n"))
+    assert submit_to_daemon(daemon.state_path, ["--prompt"]) == 0
+    out = capsys.readouterr().out
+    assert "[InfoTracer] pick the record" in out
+    assert "picked" in out
+
+
+def test_client_without_a_console_fails_the_prompt(daemon, monkeypatch, capsys):
+    monkeypatch.setattr("sys.stdin", io.StringIO(""))
+    assert submit_to_daemon(daemon.state_path, ["--prompt"]) == 1
+    assert "no console input to answer the prompt" in capsys.readouterr().out
+
+
+def test_prompt_fails_once_the_client_is_gone():
+    job = Job([], "/")
+    threading.Timer(0.05, job.detach).start()
+    with pytest.raises(EOFError):
+        job.answer_prompt(Ticket("InfoTracer", "pick"))
+    assert job.events[-1]["type"] == "prompt"
+
+
+def test_no_daemon_running(tmp_path):
+    assert submit_to_daemon(str(tmp_path / "missing.json"), []) is None
+
+
+def test_job_output_splits_lines_per_thread():
+    job = Job([], "/")
+    output = JobOutput(job, io.StringIO())
+    output.write("one\ntw")
+    output.write("o\n")
+    output.write("Press Enter")
+    output.flush()
+    assert [event["line"] for event in job.events] == ["one", "two", "Press Enter"]
+
+
+def test_async_pool_stays_resident_between_jobs(monkeypatch):
+    started = []
+
+    class Pool:
+        def __init__(self, size, modes):
+            self.size, self.modes = size, set(modes)
+            self.closed = False
+            started.append(self)
+
+        async def start(self):
+            return self
+
+        def is_connected(self):
+            return not self.closed
+
+        async def close(self):
+            self.closed = True
+
+    monkeypatch.setattr(daemon_module, "AsyncBrowserPool", Pool)
+    warm = Warm()
+
+    async def job(size):
+        async with warm.async_pool(size, {True}) as pool:
+            return pool
+
+    first = warm.run(job(2))
+    assert warm.run(job(2)) is first
+    # A different pool size needs a new pool; the old one is closed
+    assert warm.run(job(4)) is not first and first.closed
+    warm.close()
+    assert started[-1].closed
@@ -0,0 +1,189 @@
+import asyncio
+import json
+import threading
+import time
+import types
+
+import pytest
+
+import main
+from resilience import CircuitBreaker
+from scheduler import needs_human
+from telemetry import Telemetry
+
+PROMPT = {"action": "prompt_user_to_select_record", "description": "pick"}
+
+
+class Pool:
+    """Stand-in for both browser pools; the engines only maintain it here"""
+
+    def maintain(self, *args):
+        pass
+
+    def release_thread(self):
+        pass
+
+
+class AsyncPool(Pool):
+    async def maintain(self, *args):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+
+class SlowStdin:
+    """Answers every prompt, but only after the engine has had time to react"""
+
+    def readline(self):
+        time.sleep(0.2)
+        return "\n"
+
+
+def jobs(*configs):
+    return [{"config": config, "label": config["slug"]} for config in configs]
+
+
+def same_host(slug, *steps):
+    navigate = {"action": "navigate", "url": f"https://a.example/{slug}"}
+    return {"slug": slug, "max_concurrency": 1, "steps": [navigate, *steps]}
+
+
+def options():
+    return {
+        "host_rate": None,
+        "host_burst": 1,
+        "prefetch": None,
+        "headless": False,
+        "auto_answer": False,
+        "answer": None,
+        "recycle_after": 0,
+        "recycle_bytes": 0,
+        "governor": None,
+    }
+
+
+@pytest.fixture
+def finished(monkeypatch):
+    """Run brokers by just answering their prompts; collects the finished slugs"""
+    finished = []
+    monkeypatch.setattr("sys.stdin", SlowStdin())
+
+    def process_broker(job, pool, options, gate=None):
+        if needs_human(job["config"]):
+            options["prompts"].ask(job["label"], "pick")
+        finished.append(job["label"])
+        return True
+
+    async def process_broker_async(job, pool, options, gate=None):
+        if needs_human(job["config"]):
+            await options["prompts"].ask_async(job["label"], "pick")
+        finished.append(job["label"])
+        return True
+
+    monkeypatch.setattr(main, "process_broker", process_broker)
+    monkeypatch.setattr(main, "process_broker_async", process_broker_async)
+    monkeypatch.setattr(main, "AsyncBrowserPool", lambda size, modes: AsyncPool())
+    return finished
+
+
+def run_in_thread(target, *args):
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    return not thread.is_alive()
+
+
+# A prompting broker on a host limited to one broker at a time: while it
+# is parked, the worker started in its place waits on the busy host. Once
+# answered, the parked broker must still get a slot back.
+BROKERS = [same_host("a1", PROMPT), same_host("a2"), same_host("a3")]
+
+
+def test_thread_engine_finishes_when_a_parked_broker_blocks_its_host(finished):
+    work = jobs(*BROKERS)
+    assert run_in_thread(main.process_brokers_in_parallel, work, 2, Pool(), options())
+    assert sorted(finished) == ["a1", "a2", "a3"]
+
+
+def test_async_engine_finishes_when_a_parked_broker_blocks_its_host(finished):
+    work = jobs(*BROKERS)
+    engine = main.process_brokers_async(work, 2, 1, options())
+    assert run_in_thread(asyncio.run, engine)
+    assert sorted(finished) == ["a1", "a2", "a3"]
+
+
+def test_sequential_engine_applies_site_limits(finished):
+    spaced = [same_host(slug) for slug in ("a1", "a2")]
+    for config in spaced:
+        config["min_interval"] = 0.2
+    other = {"slug": "b", "steps": [{"action": "navigate", "url": "https://b.example"}]}
+    main.process_brokers_sequentially(jobs(*spaced, other), Pool(), options())
+    # a2 has to wait out a1's interval, so b goes first
+    assert finished == ["a1", "b", "a2"]
+
+
+class FlakyPage:
+    """Fails the first navigations with a network error, then loads"""
+
+    url = "about:blank"
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.waited = []
+
+    def on(self, event, handler):
+        pass
+
+    def remove_listener(self, event, handler):
+        pass
+
+    def goto(self, url):
+        if self.failures:
+            self.failures -= 1
+            raise Exception("net::ERR_CONNECTION_RESET")
+
+    def locator(self, selector):
+        return types.SimpleNamespace(count=lambda: 0)
+
+    def wait_for_timeout(self, ms):
+        self.waited.append(ms)
+
+
+class Journal:
+    def step_done(self, slug, index):
+        pass
+
+
+def retry_options(tmp_path):
+    return dict(
+        options(),
+        wait_mode="adaptive",
+        retries=2,
+        telemetry=Telemetry(None),
+        breaker=CircuitBreaker(str(tmp_path / "circuits.json")),
+    )
+
+
+def test_retry_backoff_waits_on_the_page(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "retry_delay", lambda attempt: 1.5)
+    page = FlakyPage(failures=2)
+    job = {**jobs(same_host("a1"))[0], "data": {}, "start": 0, "journal": Journal()}
+    main.run_with_retries(page, job, retry_options(tmp_path))
+    assert page.waited == [1500, 1500]
+
+
+def test_a_failed_broker_run_counts_once_against_its_site(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "retry_delay", lambda attempt: 0)
+    page = FlakyPage(failures=3)
+    job = {**jobs(same_host("a1"))[0], "data": {}, "start": 0, "journal": Journal()}
+    options = retry_options(tmp_path)
+    with pytest.raises(main.StepError):
+        main.run_with_retries(page, job, options)
+    # Three attempts, but one failure: the circuit stays closed
+    assert options["breaker"].allow("a.example")
+    state = json.loads((tmp_path / "circuits.json").read_text())
+    assert state["a.example"]["failures"] == 1
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from forms import fill_form, fill_form_async, form_field, form_run
+
+DATA = {
+    "first_name": "John",
+    "full_name": "John Doe",
+    "full_name_reversed": "Doe, John",
+    "state": "Colorado",
+    "state_abbr": "CO",
+}
+
+STEPS = [
+    {"action": "navigate", "url": "https://a.example"},
+    {"action": "fill", "selector": "#first", "field": "first_name"},
+    {"action": "fill_full_name", "selector": "#name", "format": "reversed"},
+    {"action": "fill", "selector": "#middle", "field": "middle_name"},
+    {"action": "select_state", "selector": "#state", "format": "abbr"},
+    {"action": "click", "selector": "#submit"},
+]
+
+
+class Page:
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.calls = []
+
+    def evaluate(self, script, fields):
+        self.calls.append(fields)
+        if self.error:
+            raise self.error
+        return self.result(fields) if self.result else [True] * len(fields)
+
+
+class AsyncPage(Page):
+    async def evaluate(self, script, fields):
+        return Page.evaluate(self, script, fields)
+
+
+@pytest.mark.parametrize(
+    "step, field",
+    [
+        (
+            {"action": "fill", "selector": "#f", "field": "first_name"},
+            {"selector": "#f", "kind": "fill", "value": "John"},
+        ),
+        (
+            {"action": "fill_full_name", "selector": "#n"},
+            {"selector": "#n", "kind": "fill", "value": "John Doe"},
+        ),
+        (
+            {"action": "select_state", "selector": "#s"},
+            {"selector": "#s", "kind": "select", "value": "Colorado"},
+        ),
+        (
+            {"action": "select", "selector": "#s", "label": "Other"},
+            {"selector": "#s", "kind": "select", "label": "Other"},
+        ),
+        (
+            {"action": "select", "selector": "#s", "index": 2},
+            {"selector": "#s", "kind": "select", "index": 2},
+        ),
+        (
+            {"action": "select", "selector": "#s", "field": "state_abbr"},
+            {"selector": "#s", "kind": "select", "value": "CO"},
+        ),
+    ],
+)
+def test_form_field(step, field):
+    assert form_field(step, DATA) == field
+
+
+def test_missing_values_are_not_batched():
+    step = {"action": "fill", "selector": "#m", "field": "middle_name"}
+    assert form_field(step, DATA) is None
+    assert form_field({"action": "select", "selector": "#s"}, DATA) is None
+
+
+def test_form_run_stops_at_the_first_non_form_step():
+    run = form_run(STEPS, 1, DATA)
+    assert [index for index, _ in run] == [1, 2, 4]
+    assert run[1][1]["value"] == "Doe, John"
+    assert run[2][1]["value"] == "CO"
+    assert form_run(STEPS, 0, DATA) == []
+
+
+def test_fill_form_sets_the_run_in_one_evaluation():
+    page = Page(result=lambda fields: [True, False, True])
+    assert fill_form(page, STEPS, 1, DATA) == {1: True, 2: False, 4: True}
+    assert len(page.calls) == 1 and len(page.calls[0]) == 3
+
+
+def test_single_fields_and_failed_evaluations_fall_back():
+    page = Page()
+    assert fill_form(page, STEPS, 4, DATA) == {}
+    assert page.calls == []
+    broken = Page(error=RuntimeError("detached"))
+    assert fill_form(broken, STEPS, 1, DATA) == {1: False, 2: False, 4: False}
+
+
+def test_fill_form_async():
+    page = AsyncPage()
+    done = asyncio.run(fill_form_async(page, STEPS, 1, DATA))
+    assert done == {1: True, 2: True, 4: True}
@@ -0,0 +1,86 @@
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from governor import ResourceGovernor, tree_rss
+
+
+def governor(total_mb, ceiling_mb=100):
+    governor = ResourceGovernor(ceiling_mb, interval=0.01)
+    governor.enabled = True
+    governor.total = total_mb * 2**20
+    return governor
+
+
+def test_without_a_ceiling_everything_is_admitted():
+    g = governor(1000, ceiling_mb=0)
+    with g.admitted(), g.admitted():
+        assert g.active == 2
+    assert g.active == 0 and g.peak_active == 2
+
+
+def test_one_broker_always_runs_even_above_the_ceiling():
+    g = governor(500)
+    with g.admitted():
+        assert g.active == 1
+
+
+def test_held_back_until_a_running_broker_finishes():
+    g = governor(95)
+    started = threading.Event()
+
+    def second():
+        with g.admitted():
+            started.set()
+
+    with g.admitted():
+        thread = threading.Thread(target=second)
+        thread.start()
+        time.sleep(0.05)
+        assert not started.is_set()
+        # Memory drops once the first broker is done
+        g.total = 10 * 2**20
+    thread.join(1)
+    assert started.is_set()
+    assert g.peak_active == 1
+
+
+def test_async_admission_waits_without_blocking_the_loop():
+    g = governor(95)
+    order = []
+
+    async def broker(name, hold):
+        async with g.admitted_async():
+            order.append(name)
+            await asyncio.sleep(hold)
+            g.total = 10 * 2**20
+
+    async def run():
+        await asyncio.gather(broker("a", 0.05), broker("b", 0))
+
+    asyncio.run(run())
+    assert order == ["a", "b"]
+    assert g.peak_active == 1
+
+
+def test_sample_measures_this_process():
+    g = ResourceGovernor()
+    if g.enabled:
+        g.sample()
+        assert g.total > 0 and g.peak >= g.total
+
+
+def test_tree_rss_counts_child_processes():
+    g = ResourceGovernor()
+    if not g.enabled:
+        return
+    alone = tree_rss(os.getpid())
+    child = subprocess.Popen([sys.executable, "-c", "input()"], stdin=subprocess.PIPE)
+    try:
+        time.sleep(0.2)
+        assert tree_rss(os.getpid()) > alone
+    finally:
+        child.communicate(b"\n")
@@ -0,0 +1,99 @@
+import json
+
+from journal import Journal
+
+
+CONFIG = {
+    "slug": "a",
+    "steps": [
+        {"action": "navigate", "url": "https://a.example/start"},
+        {"action": "fill", "selector": "#name", "field": "first_name"},
+        {"action": "navigate", "url": "https://a.example/form"},
+        {"action": "fill", "selector": "#email", "field": "email"},
+        {"action": "click", "selector": "#submit"},
+    ],
+}
+
+
+def events(path):
+    return [json.loads(line) for line in path.read_text().splitlines() if line]
+
+
+def test_resume_replays_progress_and_checkpoints_at_a_navigate(tmp_path):
+    path = tmp_path / "john.journal.jsonl"
+    journal = Journal(str(path))
+    for index in range(4):
+        journal.step_done("a", index)
+    journal.step_done("b", 0)
+    journal.broker_done("b", True)
+    journal.close()
+
+    resumed = Journal(str(path), resume=True)
+    assert resumed.completed == {"b"}
+    # Step 4 is next; a fresh context has to start over from step 2
+    assert resumed.checkpoint(CONFIG) == 2
+    assert resumed.checkpoint(dict(CONFIG, slug="c")) == 0
+    resumed.close()
+    assert [event["type"] for event in events(path)][-2:] == ["run", "end"]
+
+
+def test_failed_broker_restarts_from_the_beginning(tmp_path):
+    path = tmp_path / "j.jsonl"
+    journal = Journal(str(path))
+    journal.step_done("a", 3)
+    journal.broker_done("a", False)
+    journal.close()
+    resumed = Journal(str(path), resume=True)
+    assert resumed.completed == set()
+    assert resumed.checkpoint(CONFIG) == 0
+
+
+def test_torn_last_line_is_skipped_and_terminated(tmp_path):
+    path = tmp_path / "j.jsonl"
+    path.write_text(
+        '{"type":"step","broker":"a","index":2}\n{"type":"broker","broker":"a","outc'
+    )
+    journal = Journal(str(path), resume=True)
+    assert journal.completed == set()
+    assert journal.checkpoint(CONFIG) == 2
+    journal.close()
+    # The next record starts on a line of its own
+    lines = path.read_text().splitlines()
+    assert json.loads(lines[-2])["type"] == "run"
+
+
+def test_new_run_without_resume_starts_a_fresh_journal(tmp_path):
+    path = tmp_path / "j.jsonl"
+    journal = Journal(str(path))
+    journal.broker_done("a", True)
+    journal.close()
+    Journal(str(path)).close()
+    assert [event["type"] for event in events(path)] == ["run", "end"]
+
+
+def test_new_run_recovers_what_an_interrupted_run_finished(tmp_path):
+    path = tmp_path / "j.jsonl"
+    journal = Journal(str(path))
+    journal.broker_done("a", True)
+    journal.broker_done("b", False)
+    # Killed before close, so nothing was recorded in the profile
+    journal._file.close()
+    fresh = Journal(str(path))
+    assert fresh.recovered == {"a"}
+    assert fresh.completed == set()
+    fresh.close()
+    # A run that finished cleanly has nothing left to recover
+    again = Journal(str(path))
+    assert again.recovered == set()
+    again.close()
+
+
+def test_read_only_journal_leaves_the_file_alone(tmp_path):
+    path = tmp_path / "j.jsonl"
+    path.write_text('{"type":"step","broker":"a","index":3}\n')
+    journal = Journal(str(path), resume=True, write=False)
+    assert journal.checkpoint(CONFIG) == 2
+    journal.step_done("a", 4)
+    journal.broker_done("a", True)
+    journal.close()
+    assert path.read_text() == '{"type":"step","broker":"a","index":3}\n'
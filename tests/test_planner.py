@@ -0,0 +1,106 @@
+import pytest
+
+from planner import check_broker, step_counts, step_fields
+
+
+DATA = {
+    "first_name": "John",
+    "last_name": "Doe",
+    "full_name": "John Doe",
+    "full_name_reversed": "Doe, John",
+    "email": "john@example.com",
+    "zip": "80302",
+    "state": "colorado",
+    "state_abbr": "CO",
+    "phone": None,
+    "city": None,
+}
+
+
+def config(*steps, required=()):
+    return {"slug": "a", "required_fields": list(required), "steps": list(steps)}
+
+
+NAVIGATE = {"action": "navigate", "url": "https://a.example"}
+
+
+@pytest.mark.parametrize(
+    "step, fields",
+    [
+        ({"action": "fill", "selector": "#p", "field": "phone"}, ["phone"]),
+        (
+            {"action": "fill_full_name", "selector": "#n", "format": "reversed"},
+            ["full_name_reversed"],
+        ),
+        ({"action": "select_state", "selector": "#s", "format": "abbr"}, ["state"]),
+        ({"action": "select", "selector": "#s", "field": "city"}, ["city"]),
+        # A fixed value wins over field, like in the step interpreter
+        ({"action": "select", "selector": "#s", "value": "x", "field": "city"}, []),
+        ({"action": "click", "selector": "#go"}, []),
+    ],
+)
+def test_step_fields(step, fields):
+    assert step_fields(step) == fields
+
+
+def test_satisfiable_broker_has_no_problems():
+    broker = config(
+        NAVIGATE,
+        {"action": "fill", "selector": "#e", "field": "email"},
+        {"action": "select_state", "selector": "#s"},
+        required=["email", "zip"],
+    )
+    assert check_broker(broker, DATA) == []
+
+
+def test_missing_required_field_and_step_field():
+    broker = config(
+        NAVIGATE,
+        {"action": "fill", "selector": "#p", "field": "phone"},
+        {"action": "click", "selector": "#go"},
+        {"action": "wait", "seconds": 1},
+        required=["phone"],
+    )
+    assert check_broker(broker, DATA) == [
+        "missing required field 'phone'",
+        "step 1 (fill) needs 'phone', which is missing",
+        "steps 2-3 are never reached",
+    ]
+
+
+def test_single_unreachable_step_is_named_once():
+    fill_city = {"action": "fill", "selector": "#c", "field": "city"}
+    broker = config(NAVIGATE, fill_city, NAVIGATE)
+    assert check_broker(broker, DATA)[-1] == "step 2 is never reached"
+
+
+def test_page_step_before_any_navigate():
+    broker = config({"action": "click", "selector": "#go"}, NAVIGATE)
+    assert check_broker(broker, DATA) == [
+        "step 0 (click) comes before any navigate",
+        "step 1 is never reached",
+    ]
+    # Waits and prompts don't need a page
+    assert check_broker(config({"action": "wait", "seconds": 1}, NAVIGATE), DATA) == []
+
+
+def test_resumed_broker_is_checked_from_its_checkpoint():
+    broker = config(
+        NAVIGATE,
+        {"action": "fill", "selector": "#p", "field": "phone"},
+        NAVIGATE,
+        {"action": "click", "selector": "#go"},
+    )
+    assert check_broker(broker, DATA, start=2) == []
+
+
+def test_step_counts():
+    broker = config(
+        NAVIGATE,
+        {"action": "wait", "seconds": 2.5},
+        {"action": "prompt_user_to_select_record", "description": "pick"},
+        NAVIGATE,
+        {"action": "wait", "seconds": 3},
+    )
+    assert step_counts(broker) == {"navigations": 2, "wait_seconds": 5.5, "prompts": 1}
+    assert step_counts(broker, 3) == {"navigations": 1, "wait_seconds": 3, "prompts": 0}
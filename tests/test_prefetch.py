@@ -0,0 +1,24 @@
+from prefetch import prefetch_budget, prefetch_end
+
+CONFIG = {
+    "steps": [
+        {"action": "navigate", "url": "https://a.example/form"},
+        {"action": "wait_for_selector", "selector": "#form"},
+        {"action": "fill", "selector": "#name", "field": "first_name"},
+        {"action": "click", "selector": "#submit"},
+        {"action": "navigate", "url": "https://a.example/done"},
+    ]
+}
+
+
+def test_prefetch_stops_before_the_first_interaction():
+    assert prefetch_end(CONFIG, 0) == 3
+    assert prefetch_end(CONFIG, 3) == 3
+    assert prefetch_end(CONFIG, 4) == 5
+
+
+def test_prefetch_budget_counts_pages():
+    budget = prefetch_budget(130)
+    assert budget.acquire(blocking=False) and budget.acquire(blocking=False)
+    assert not budget.acquire(blocking=False)
+    assert prefetch_budget(10) is None
@@ -0,0 +1,109 @@
+import asyncio
+import io
+import threading
+
+import pytest
+
+from prompts import PromptBroker
+
+
+def test_prompt_is_answered_from_the_console(monkeypatch):
+    monkeypatch.setattr("sys.stdin", io.StringIO("\n"))
+    with PromptBroker() as prompts:
+        prompts.ask("InfoTracer", "pick")
+
+
+def test_waiting_worker_gives_its_slot_back(monkeypatch):
+    monkeypatch.setattr("sys.stdin", io.StringIO("\n"))
+    slots = threading.Semaphore(1)
+    parked = []
+
+    def on_park():
+        # The slot is free while the worker waits on the console
+        parked.append(slots.acquire(blocking=False))
+        slots.release()
+
+    slots.acquire()
+    with PromptBroker(slots=slots, on_park=on_park) as prompts:
+        prompts.ask("InfoTracer", "pick")
+    assert parked == [True]
+    assert not slots.acquire(blocking=False)
+
+
+def test_waiting_on_a_page_keeps_its_events_flowing(monkeypatch):
+    answered = threading.Event()
+
+    class Stdin:
+        def readline(self):
+            answered.wait()
+            return "\n"
+
+    class Page:
+        polls = 0
+
+        def wait_for_timeout(self, ms):
+            # The route handlers run in here; answer once they have had a turn
+            self.polls += 1
+            answered.set()
+
+    monkeypatch.setattr("sys.stdin", Stdin())
+    slots = threading.Semaphore(1)
+    page = Page()
+    slots.acquire()
+    with PromptBroker(slots=slots) as prompts:
+        prompts.ask("InfoTracer", "pick", page)
+    assert page.polls >= 1
+    assert not slots.acquire(blocking=False)
+
+
+def test_async_prompt_is_answered_from_the_console(monkeypatch):
+    monkeypatch.setattr("sys.stdin", io.StringIO("\n"))
+    slots = asyncio.Semaphore(1)
+
+    async def run():
+        prompts = PromptBroker(slots=slots).start()
+        await slots.acquire()
+        try:
+            await prompts.ask_async("InfoTracer", "pick")
+        finally:
+            prompts.stop()
+        assert slots.locked()
+
+    asyncio.run(run())
+
+
+def test_closed_stdin_fails_the_prompt(monkeypatch):
+    monkeypatch.setattr("sys.stdin", io.StringIO(""))
+    with PromptBroker() as prompts:
+        with pytest.raises(RuntimeError, match="no console input"):
+            prompts.ask("InfoTracer", "pick")
+        # Later prompts fail straight away instead of waiting on input
+        with pytest.raises(RuntimeError):
+            prompts.ask("Property Recs", "pick")
+
+
+def test_closed_stdin_fails_async_prompts(monkeypatch):
+    monkeypatch.setattr("sys.stdin", io.StringIO(""))
+    slots = asyncio.Semaphore(1)
+
+    async def run():
+        prompts = PromptBroker(slots=slots).start()
+        await slots.acquire()
+        try:
+            with pytest.raises(RuntimeError):
+                await prompts.ask_async("InfoTracer", "pick")
+        finally:
+            prompts.stop()
+        # The slot was taken back after the failed prompt
+        assert slots.locked()
+
+    asyncio.run(run())
+
+
+def test_auto_answer_never_reads_stdin(monkeypatch, capsys):
+    monkeypatch.setattr("sys.stdin", io.StringIO(""))
+    slots = threading.Semaphore(1)
+    with PromptBroker(slots=slots, auto_answer=True) as prompts:
+        prompts.ask("InfoTracer", "pick")
+        asyncio.run(prompts.ask_async("Property Recs", "pick"))
+    assert capsys.readouterr().out.count("Auto-answered prompt") == 2
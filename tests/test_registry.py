@@ -0,0 +1,114 @@
+import os
+
+import pytest
+
+import registry
+from registry import BrokerRegistry, load_skip_list, validate_config
+
+BROKER = """name: Example
+slug: {slug}
+steps:
+  - action: navigate
+    url: https://example.com
+"""
+
+
+@pytest.fixture
+def broker_dir(tmp_path):
+    directory = tmp_path / "brokers"
+    directory.mkdir()
+    (directory / "a.yaml").write_text(BROKER.format(slug="a"))
+    (directory / "b.yaml").write_text(BROKER.format(slug="b"))
+    return directory
+
+
+@pytest.fixture
+def compiles(monkeypatch):
+    """Record each file the registry has to parse"""
+    seen = []
+    compile_ = BrokerRegistry._compile
+
+    def spy(self, path, stat, digest):
+        seen.append(os.path.basename(path))
+        return compile_(self, path, stat, digest)
+
+    monkeypatch.setattr(BrokerRegistry, "_compile", spy)
+    return seen
+
+
+def test_validate_config_reports_every_problem():
+    assert validate_config({"name": "A", "slug": "a", "steps": []}) == []
+    errors = validate_config(
+        {
+            "name": "A",
+            "steps": [
+                {"action": "fill", "selector": "#x"},
+                {"action": "teleport"},
+                {"action": "select", "selector": "#s"},
+                "click",
+            ],
+        }
+    )
+    assert errors == [
+        "missing 'slug'",
+        "step 0 (fill): missing 'field'",
+        "step 1: unknown action 'teleport'",
+        "step 2 (select): needs one of value, label, index or field",
+        "step 3: missing 'action'",
+    ]
+    assert validate_config([]) == ["config is not a mapping"]
+
+
+def test_skip_list_ignores_comments_and_blanks(tmp_path):
+    path = tmp_path / "skip.txt"
+    path.write_text("# skipped for now\na\n\nb\n")
+    assert load_skip_list(str(path)) == {"a", "b"}
+    assert load_skip_list(str(tmp_path / "missing.txt")) == set()
+
+
+def test_registry_reuses_the_cache(broker_dir, tmp_path, compiles):
+    cache = str(tmp_path / "cache" / "registry.json")
+    first = BrokerRegistry(str(broker_dir), cache)
+    assert first.slugs() == ["a", "b"]
+    assert compiles == ["a.yaml", "b.yaml"]
+
+    second = BrokerRegistry(str(broker_dir), cache)
+    assert second.slugs() == ["a", "b"]
+    assert second.get("a")["name"] == "Example"
+    assert compiles == ["a.yaml", "b.yaml"]
+
+
+def test_touched_file_with_same_content_is_not_reparsed(broker_dir, tmp_path, compiles):
+    cache = str(tmp_path / "registry.json")
+    BrokerRegistry(str(broker_dir), cache)
+    stat = os.stat(broker_dir / "a.yaml")
+    os.utime(broker_dir / "a.yaml", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    BrokerRegistry(str(broker_dir), cache)
+    assert compiles == ["a.yaml", "b.yaml"]
+
+
+def test_changed_file_is_reparsed(broker_dir, tmp_path, compiles):
+    cache = str(tmp_path / "registry.json")
+    BrokerRegistry(str(broker_dir), cache)
+    (broker_dir / "a.yaml").write_text(BROKER.format(slug="renamed"))
+    assert BrokerRegistry(str(broker_dir), cache).slugs() == ["renamed", "b"]
+    assert compiles == ["a.yaml", "b.yaml", "a.yaml"]
+
+
+def test_invalid_and_duplicate_configs_are_skipped(broker_dir, tmp_path):
+    (broker_dir / "c.yaml").write_text(BROKER.format(slug="a"))
+    (broker_dir / "d.yaml").write_text("name: [unclosed")
+    (broker_dir / "e.yaml").write_text("name: E\nslug: e\n")
+    brokers = BrokerRegistry(str(broker_dir), str(tmp_path / "registry.json"))
+    assert brokers.slugs() == ["a", "b"]
+    assert brokers.errors["c.yaml"] == ["duplicate slug 'a'"]
+    assert brokers.errors["d.yaml"][0].startswith("could not parse YAML")
+    assert brokers.errors["e.yaml"] == ["missing 'steps'"]
+
+
+def test_stale_cache_version_is_ignored(broker_dir, tmp_path, compiles, monkeypatch):
+    cache = str(tmp_path / "registry.json")
+    BrokerRegistry(str(broker_dir), cache)
+    monkeypatch.setattr(registry, "CACHE_VERSION", registry.CACHE_VERSION + 1)
+    BrokerRegistry(str(broker_dir), cache)
+    assert compiles == ["a.yaml", "b.yaml", "a.yaml", "b.yaml"]
@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+import resilience
+from resilience import (
+    CircuitBreaker,
+    SiteError,
+    StepError,
+    check_response,
+    classify,
+    restart_point,
+    retry_delay,
+)
+
+
+class TimeoutError(Exception):
+    """Named like Playwright's timeout, which classify goes by"""
+
+
+CONFIG = {
+    "steps": [
+        {"action": "navigate", "url": "https://a.example"},
+        {"action": "fill", "selector": "#name", "field": "first_name"},
+        {"action": "navigate", "url": "https://a.example/form"},
+        {"action": "click", "selector": "#submit"},
+    ]
+}
+
+
+@pytest.mark.parametrize(
+    "action, cause, kind",
+    [
+        ("navigate", SiteError(503, "https://a.example"), "http_5xx"),
+        ("navigate", TimeoutError("30000ms"), "navigation_timeout"),
+        ("wait_for_url", TimeoutError("30000ms"), "navigation_timeout"),
+        ("click", TimeoutError("30000ms"), "selector_missing"),
+        ("navigate", Exception("net::ERR_CONNECTION_RESET"), "network_error"),
+        ("fill", ValueError("no field"), "other"),
+    ],
+)
+def test_classify(action, cause, kind):
+    assert classify(StepError(1, action, cause)) == kind
+
+
+def test_captcha_wins_over_the_cause():
+    error = StepError(0, "navigate", TimeoutError("30000ms"))
+    assert classify(error, captcha=True) == "captcha"
+
+
+def test_check_response_raises_on_server_errors():
+    check_response(None, "https://a.example")
+    check_response(type("Response", (), {"status": 404}), "https://a.example")
+    with pytest.raises(SiteError, match="HTTP 502"):
+        check_response(type("Response", (), {"status": 502}), "https://a.example")
+
+
+def test_restart_point_backs_up_to_a_navigate():
+    assert restart_point(CONFIG, 3) == 2
+    assert restart_point(CONFIG, 2) == 2
+    assert restart_point(CONFIG, 1) == 0
+    assert restart_point(CONFIG, 10) == 2
+    assert restart_point({"steps": [{"action": "click", "selector": "#x"}]}, 0) == 0
+
+
+def test_retry_delay_is_capped_full_jitter(monkeypatch):
+    monkeypatch.setattr(resilience.random, "uniform", lambda low, high: high)
+    assert retry_delay(0) == 2
+    assert retry_delay(2) == 8
+    assert retry_delay(10) == 30
+
+
+def test_circuit_opens_after_threshold_and_persists(tmp_path, monkeypatch):
+    monkeypatch.setattr(resilience.time, "time", lambda: 1000.0)
+    path = tmp_path / "circuit.json"
+    breaker = CircuitBreaker(str(path), threshold=2, cooldown=60)
+    breaker.record_failure("a.example")
+    assert breaker.allow("a.example")
+    breaker.record_failure("a.example")
+    assert breaker.open_until("a.example") == 1060
+    assert json.loads(path.read_text())["a.example"]["failures"] == 2
+
+    # A later run sees the open circuit until the cooldown is over
+    assert not CircuitBreaker(str(path)).allow("a.example")
+    monkeypatch.setattr(resilience.time, "time", lambda: 1061.0)
+    assert CircuitBreaker(str(path)).allow("a.example")
+
+
+def test_success_resets_the_failure_count(tmp_path):
+    breaker = CircuitBreaker(str(tmp_path / "circuit.json"), threshold=2)
+    breaker.record_failure("a.example")
+    breaker.record_success("a.example")
+    breaker.record_failure("a.example")
+    assert breaker.allow("a.example")
+
+
+def test_damaged_state_file_starts_closed(tmp_path):
+    path = tmp_path / "circuit.json"
+    path.write_text("{not json")
+    assert CircuitBreaker(str(path)).allow("a.example")
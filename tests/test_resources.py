@@ -0,0 +1,80 @@
+import types
+
+import pytest
+
+from resources import (
+    broker_site,
+    parse_block_list,
+    resource_policy,
+    should_block,
+    site_of,
+)
+
+
+def request(url, resource_type, top_level=False):
+    frame = types.SimpleNamespace(parent_frame=None if top_level else object())
+    return types.SimpleNamespace(url=url, resource_type=resource_type, frame=frame)
+
+
+def test_parse_block_list():
+    assert parse_block_list("image, font,,") == {"image", "font"}
+    assert parse_block_list(None) == set()
+    with pytest.raises(ValueError, match="Unknown resource type"):
+        parse_block_list("image,banners")
+
+
+def test_broker_block_list_replaces_the_run_wide_one():
+    assert resource_policy({}, {"image"}) == {"image"}
+    assert resource_policy({"block": []}, {"image"}) == set()
+    assert resource_policy({"block": ["font", "bogus"]}, {"image"}) == {"font"}
+
+
+@pytest.mark.parametrize(
+    "url, site",
+    [
+        ("https://www.infotracer.com/optout", "infotracer.com"),
+        ("https://infotracer.com", "infotracer.com"),
+        ("https://optout.people.co.uk/form", "people.co.uk"),
+        ("https://www.records.com.au", "records.com.au"),
+        ("https://co.uk", "co.uk"),
+        ("http://127.0.0.1:8000/optout", "127.0.0.1"),
+        ("http://10.0.0.12/optout", "10.0.0.12"),
+        ("http://[::1]:8000/", "::1"),
+        ("http://localhost:8000/", "localhost"),
+        ("", ""),
+    ],
+)
+def test_site_of(url, site):
+    assert site_of(url) == site
+
+
+def test_sites_on_one_country_suffix_are_third_parties_to_each_other():
+    site = site_of("https://www.people.co.uk")
+    tracker = request("https://tracker.co.uk/t.js", "script")
+    assert should_block(tracker, {"third_party"}, site)
+
+
+def test_broker_site_falls_back_to_the_first_navigation():
+    steps = [
+        {"action": "wait", "seconds": 1},
+        {"action": "navigate", "url": "https://a.b.example.com/x"},
+    ]
+    assert broker_site({"steps": steps}) == "example.com"
+    assert broker_site({"url": "https://other.org", "steps": steps}) == "other.org"
+
+
+def test_should_block():
+    site = "example.com"
+    policy = {"image", "third_party"}
+
+    def blocked(url, resource_type, policy=policy):
+        return should_block(request(url, resource_type), policy, site)
+
+    # The page itself always loads, even when documents are third party
+    page = request("https://elsewhere.net/", "document", top_level=True)
+    assert not should_block(page, policy, site)
+    assert blocked("https://example.com/logo.png", "image")
+    assert not blocked("https://cdn.example.com/app.js", "script")
+    assert blocked("https://tracker.net/t.js", "script")
+    assert blocked("https://badexample.com/t.js", "script")
+    assert not blocked("https://tracker.net/t.js", "script", policy={"image"})
@@ -0,0 +1,185 @@
+import math
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+import scheduler
+from scheduler import (
+    Dispatcher,
+    estimate_costs,
+    estimate_makespan,
+    load_history,
+    overdue_by,
+    save_history,
+    schedule,
+    static_cost,
+)
+
+
+def broker(slug, url=None, prompt=False, **config):
+    steps = [{"action": "navigate", "url": url or f"https://{slug}.example/optout"}]
+    if prompt:
+        steps.append({"action": "prompt_user_to_select_record", "description": "pick"})
+    return dict(config, slug=slug, name=slug, steps=steps)
+
+
+def job(slug, url=None, prompt=False, **config):
+    return {"config": broker(slug, url, prompt, **config), "label": slug}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(scheduler.time, "monotonic", clock)
+    return clock
+
+
+def slugs(jobs):
+    return [job["config"]["slug"] for job in jobs]
+
+
+def test_static_cost_counts_waits_navigations_and_prompts():
+    config = {
+        "steps": [
+            {"action": "navigate", "url": "https://a.example"},
+            {"action": "wait", "seconds": 4},
+            {"action": "click", "selector": "#go"},
+            {"action": "prompt_user_to_select_record", "description": "pick"},
+        ]
+    }
+    expected = (
+        scheduler.NAVIGATE_COST + 4 + scheduler.STEP_COST + scheduler.PROMPT_COST
+    )
+    assert static_cost(config) == expected
+
+
+def test_history_keeps_recent_successful_runs(tmp_path):
+    log = tmp_path / "telemetry.jsonl"
+    lines = [
+        f'{{"type":"broker","broker":"a","outcome":"ok","duration":{i}}}'
+        for i in range(7)
+    ]
+    lines.append('{"type":"broker","broker":"a","outcome":"error","duration":99}')
+    lines.append("{torn")
+    log.write_text("\n".join(lines) + "\n")
+    history = load_history(str(log))
+    assert list(history["a"]) == [2, 3, 4, 5, 6]
+
+
+def test_costs_prefer_history_over_the_static_estimate():
+    configs = [broker("a"), broker("b")]
+    costs = estimate_costs(configs, {"a": [4, 2, 9]})
+    assert costs == {"a": 4, "b": scheduler.NAVIGATE_COST}
+
+
+def test_schedule_is_longest_first_with_prompts_spread_out():
+    jobs = [
+        job("a"),
+        job("b"),
+        job("c"),
+        job("d"),
+        job("h1", prompt=True),
+        job("h2", prompt=True),
+    ]
+    costs = {"a": 10, "b": 40, "c": 30, "d": 20, "h1": 5, "h2": 50}
+    assert slugs(schedule(jobs, costs)) == ["h2", "b", "c", "h1", "d", "a"]
+
+
+def test_schedule_without_human_brokers_is_plain_longest_first():
+    jobs = [job("a"), job("b"), job("c")]
+    assert slugs(schedule(jobs, {"a": 1, "b": 3, "c": 2})) == ["b", "c", "a"]
+
+
+def test_estimate_makespan_uses_greedy_list_scheduling():
+    jobs = [job("a"), job("b"), job("c")]
+    costs = {"a": 10, "b": 6, "c": 5}
+    assert estimate_makespan(jobs, costs, 2) == 11
+    assert estimate_makespan(jobs, costs, 1) == 21
+
+
+def test_dispatcher_respects_max_concurrency_per_host(clock):
+    jobs = [
+        job("a1", "https://a.example/x", max_concurrency=1),
+        job("a2", "https://a.example/y", max_concurrency=1),
+        job("b", "https://b.example/x"),
+    ]
+    dispatcher = Dispatcher(jobs)
+    first = dispatcher.next()
+    assert first["config"]["slug"] == "a1"
+    # a2 shares a1's site, so b goes ahead of it
+    assert dispatcher.next()["config"]["slug"] == "b"
+    assert dispatcher.next_nowait() is None
+    dispatcher.done(first)
+    assert dispatcher.next()["config"]["slug"] == "a2"
+    assert not dispatcher.has_pending()
+    assert dispatcher.next() is None
+
+
+def test_dispatcher_waits_out_min_interval(clock):
+    jobs = [
+        job("a1", "https://a.example/x", min_interval=5),
+        job("a2", "https://a.example/y", min_interval=5),
+    ]
+    dispatcher = Dispatcher(jobs)
+    dispatcher.done(dispatcher.next())
+    assert dispatcher._take() == (None, 5)
+    clock.now += 5
+    assert dispatcher.next()["config"]["slug"] == "a2"
+
+
+def test_dispatcher_token_bucket_limits_host_rate(clock):
+    jobs = [job(f"a{i}", f"https://a.example/{i}") for i in range(3)]
+    dispatcher = Dispatcher(jobs, host_rate=6, host_burst=2)
+    for _ in range(2):
+        dispatcher.done(dispatcher.next())
+    # The burst is spent; one token comes back every 10 seconds
+    job_, wait = dispatcher._take()
+    assert job_ is None and wait == pytest.approx(10)
+    clock.now += 10
+    assert dispatcher.next()["config"]["slug"] == "a2"
+
+
+def test_overdue_by():
+    now = datetime(2026, 1, 10)
+    config = {"recheck_after_days": 7}
+    assert overdue_by({}, now - timedelta(days=30), now) is None
+    assert overdue_by(config, now - timedelta(days=3), now) is None
+    assert overdue_by(config, now - timedelta(days=8), now) == 86400
+    assert overdue_by(config, None, now) == math.inf
+
+
+def test_history_summary_round_trip(tmp_path):
+    log = tmp_path / "telemetry.jsonl"
+    log.write_text('{"type":"broker","broker":"a","outcome":"ok","duration":2.0}\n')
+    history = load_history(str(log))
+    assert list(history["a"]) == [2.0]
+
+    save_history(str(log), history, {"a": [3.0] * 6, "b": [1.0]})
+    # The summary is newer than the log now, so the log isn't read again
+    log.write_text("not json\n")
+    os.utime(log, (0, 0))
+    history = load_history(str(log))
+    assert list(history["a"]) == [3.0] * scheduler.HISTORY_RUNS
+    assert list(history["b"]) == [1.0]
+
+
+def test_history_falls_back_to_the_log_when_the_summary_is_stale(tmp_path):
+    log = tmp_path / "telemetry.jsonl"
+    save_history(str(log), {}, {"a": [9.0]})
+    summary = scheduler.history_path(str(log))
+    os.utime(summary, (0, 0))
+    log.write_text(
+        '{"type":"broker","broker":"a","outcome":"ok","duration":1.5}\n'
+        '{"type":"broker","broker":"a","outcome":"error","duration":7}\n'
+        "{torn\n"
+    )
+    assert list(load_history(str(log))["a"]) == [1.5]
@@ -0,0 +1,102 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from state import (
+    JsonStore,
+    SqliteStore,
+    completion_times,
+    import_json_profiles,
+    open_store,
+)
+
+FIELDS = {
+    "first_name": "John",
+    "last_name": "Doe",
+    "email": "john@example.com",
+    "zip": "80302",
+}
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def store(request, tmp_path):
+    store = open_store(request.param, str(tmp_path))
+    yield store
+    store.close()
+
+
+def test_save_and_load(store):
+    assert store.load("john") is None
+    stamps = {"a": "2026-01-01T00:00:00"}
+    store.save("john", dict(FIELDS, processed_brokers=["b", "a"], processed_at=stamps))
+    user_data = store.load("john")
+    assert user_data["first_name"] == "John"
+    assert user_data["processed_brokers"] == ["a", "b"]
+    assert user_data["processed_at"]["a"] == "2026-01-01T00:00:00"
+    assert store.names() == ["john"]
+
+
+def test_mark_processed_adds_to_existing_brokers(store):
+    store.save("john", dict(FIELDS, processed_brokers=["a"]))
+    assert store.mark_processed("john", {"a", "b"}) == 1
+    assert store.mark_processed("john", {"c"}) == 1
+    user_data = store.load("john")
+    assert user_data["processed_brokers"] == ["a", "b", "c"]
+    assert set(completion_times(user_data)) == {"a", "b", "c"}
+
+
+def test_json_writes_leave_no_temporary_file(tmp_path):
+    store = JsonStore(str(tmp_path))
+    store.save("john", dict(FIELDS))
+    store.mark_processed("john", {"a"})
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["john.json"]
+
+
+def test_sqlite_save_keeps_timestamps_of_brokers_that_stay(tmp_path):
+    store = SqliteStore(str(tmp_path / "p.db"))
+    stamp = "2026-01-01T00:00:00"
+    store.save("john", dict(FIELDS, processed_brokers=["a", "b"]), completed=stamp)
+    store.save("john", dict(FIELDS, email="new@example.com", processed_brokers=["a"]))
+    user_data = store.load("john")
+    assert user_data["email"] == "new@example.com"
+    assert user_data["processed_at"] == {"a": stamp}
+    store.close()
+
+
+def test_sqlite_concurrent_connections_merge_instead_of_overwriting(tmp_path):
+    path = str(tmp_path / "p.db")
+    first, second = SqliteStore(path), SqliteStore(path)
+    first.save("john", dict(FIELDS))
+    first.mark_processed("john", {"a"})
+    second.mark_processed("john", {"b"})
+    assert first.load("john")["processed_brokers"] == ["a", "b"]
+    second.record_run("john", "2026-01-01T00:00:00", 2, 1)
+    runs = first._db.execute("SELECT profile, attempted, completed FROM runs")
+    assert [tuple(run) for run in runs.fetchall()] == [("john", 2, 1)]
+    first.close()
+    second.close()
+
+
+def test_import_json_profiles(tmp_path):
+    (tmp_path / "john.json").write_text(
+        json.dumps(dict(FIELDS, processed_brokers=["a"], last_updated="2026-01-01"))
+    )
+    (tmp_path / "broken.json").write_text("{")
+    database = SqliteStore(str(tmp_path / "p.db"))
+    assert import_json_profiles(str(tmp_path), database) == ["john"]
+    assert database.load("john")["processed_at"] == {"a": "2026-01-01"}
+    database.close()
+
+
+def test_completion_times_fall_back_to_last_updated():
+    user_data = {
+        "processed_brokers": ["a", "b", "c"],
+        "processed_at": {"a": "2026-02-01T00:00:00", "c": "garbage"},
+        "last_updated": "2026-01-01T00:00:00",
+    }
+    assert completion_times(user_data) == {
+        "a": datetime(2026, 2, 1),
+        "b": datetime(2026, 1, 1),
+        "c": None,
+    }
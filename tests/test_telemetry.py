@@ -0,0 +1,80 @@
+import pytest
+
+import telemetry as telemetry_module
+from telemetry import Telemetry, percentile, read_events, summarize
+
+CONFIG = {"slug": "infotracer"}
+
+
+def test_events_are_appended_per_step_and_broker(tmp_path):
+    path = tmp_path / "logs" / "telemetry.jsonl"
+    telemetry = Telemetry(str(path))
+    with telemetry.broker(CONFIG):
+        with telemetry.step(CONFIG, 0, {"action": "navigate"}) as event:
+            event["bytes"] = 512
+        with pytest.raises(ValueError):
+            with telemetry.step(CONFIG, 1, {"action": "click", "selector": "#go"}):
+                raise ValueError("gone")
+    telemetry.close()
+
+    step, failed, broker = read_events(str(path))
+    assert (step["type"], step["action"], step["bytes"]) == ("step", "navigate", 512)
+    assert failed["outcome"] == "error"
+    assert failed["error"] == "ValueError: gone"
+    assert broker["type"] == "broker" and broker["outcome"] == "ok"
+    assert step["run"] == broker["run"] == telemetry.run_id
+    assert broker["start"] <= step["start"] <= step["end"] <= broker["end"]
+
+
+def test_without_a_path_nothing_is_written(tmp_path):
+    telemetry = Telemetry(None)
+    with telemetry.broker(CONFIG):
+        pass
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_damaged_lines_are_skipped(tmp_path):
+    path = tmp_path / "telemetry.jsonl"
+    path.write_text('{"type":"step"}\n{"type":\n')
+    assert list(read_events(str(path))) == [{"type": "step"}]
+    assert list(read_events(str(tmp_path / "missing.jsonl"))) == []
+
+
+def test_percentile_uses_nearest_rank():
+    values = [4, 1, 3, 2]
+    assert percentile(values, 50) == 2
+    assert percentile(values, 95) == 4
+    assert percentile([7], 95) == 7
+
+
+def test_summary_totals_prompts_and_waits(tmp_path, capsys):
+    path = tmp_path / "telemetry.jsonl"
+    telemetry = Telemetry(str(path))
+    steps = (("wait", 2), ("wait", 3), ("prompt_user_to_select_record", 10))
+    for action, duration in steps:
+        telemetry.record(
+            {"type": "step", "broker": "a", "action": action, "duration": duration}
+        )
+    telemetry.record({"type": "broker", "broker": "a", "duration": 15})
+    telemetry.close()
+
+    summarize(str(path))
+    out = capsys.readouterr().out
+    assert "Telemetry from 1 run(s)" in out
+    assert "Time waiting on human prompts: 10.0s" in out
+    assert "Time in fixed waits: 5.0s across 2 wait step(s)" in out
+
+
+def test_large_log_is_rotated_and_durations_are_kept(tmp_path, monkeypatch):
+    monkeypatch.setattr(telemetry_module, "MAX_TELEMETRY_BYTES", 10)
+    path = tmp_path / "telemetry.jsonl"
+    old = '{"type":"step","duration":1}\n'
+    path.write_text(old)
+    telemetry = Telemetry(str(path))
+    with telemetry.broker(CONFIG):
+        pass
+    telemetry.record({"type": "broker", "broker": "b", "outcome": "error"})
+    telemetry.close()
+    assert (tmp_path / "telemetry.jsonl.1").read_text() == old
+    assert len(list(read_events(str(path)))) == 2
+    assert list(telemetry.durations) == ["infotracer"]
@@ -0,0 +1,119 @@
+import pytest
+
+import waits
+from waits import NetworkMonitor, StepWaiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class Page:
+    """Just enough of a page to drive the waits, on a fake clock"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.url = "https://a.example/form"
+        self.handlers = {}
+        self.timeline = {}
+        self.waited = 0.0
+
+    def on(self, event, handler):
+        self.handlers.setdefault(event, []).append(handler)
+
+    def remove_listener(self, event, handler):
+        self.handlers[event].remove(handler)
+
+    def emit(self, event, payload):
+        for handler in self.handlers.get(event, []):
+            handler(payload)
+
+    def wait_for_timeout(self, ms):
+        self.clock.now += ms / 1000
+        self.waited += ms / 1000
+        for at in sorted(self.timeline):
+            if at <= self.clock.now:
+                self.timeline.pop(at)()
+
+
+class Response:
+    def __init__(self, url, status=200):
+        self.url = url
+        self.status = status
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(waits.time, "monotonic", clock)
+    return clock
+
+
+def test_monitor_tracks_requests_and_responses(clock):
+    page = Page(clock)
+    monitor = NetworkMonitor(page)
+    start = clock.now
+    page.emit("request", object())
+    clock.now += 1
+    assert not monitor.idle_since(start)
+    page.emit("requestfinished", object())
+    page.emit("response", Response("https://a.example/api/submit", 201))
+    assert not monitor.idle_since(start)
+    clock.now += waits.IDLE_WINDOW
+    assert monitor.idle_since(start)
+
+    assert monitor.find_response("*/api/*", start)
+    assert monitor.find_response("*/api/*", start, status=201)
+    assert not monitor.find_response("*/api/*", start, status=200)
+    assert not monitor.find_response("*/api/*", clock.now)
+
+
+def test_closed_waiters_leave_no_listeners_behind(clock):
+    page = Page(clock)
+    for _ in range(3):
+        StepWaiter(page, "A").close()
+    assert not any(page.handlers.values())
+
+
+def test_legacy_wait_returns_once_the_page_settles(clock):
+    page = Page(clock)
+    waiter = StepWaiter(page, "A")
+    page.emit("request", object())
+    page.timeline[clock.now + 1] = lambda: page.emit("requestfinished", object())
+    waiter.wait({"action": "wait", "seconds": 10}, 0)
+    assert 1 + waits.IDLE_WINDOW <= page.waited < 2
+
+
+def test_legacy_wait_in_migrate_mode_keeps_the_full_sleep(clock, capsys):
+    page = Page(clock)
+    waiter = StepWaiter(page, "A", mode="migrate")
+    waiter.wait({"action": "wait", "seconds": 3}, 4)
+    assert page.waited == pytest.approx(3)
+    assert "step 4: 3s wait, page settled after" in capsys.readouterr().out
+
+
+def test_wait_for_response_only_counts_responses_after_the_last_step(clock):
+    page = Page(clock)
+    waiter = StepWaiter(page, "A")
+    page.emit("response", Response("https://a.example/api/submit"))
+    clock.now += 1
+    waiter.mark()
+    page.timeline[clock.now + 2] = lambda: page.emit(
+        "response", Response("https://a.example/api/submit")
+    )
+    waiter.wait({"action": "wait_for_response", "url": "*/api/submit"}, 1)
+    assert page.waited == pytest.approx(2, abs=0.15)
+
+
+def test_condition_waits_time_out(clock):
+    page = Page(clock)
+    waiter = StepWaiter(page, "A")
+    page.emit("request", object())
+    with pytest.raises(TimeoutError, match="idle within 2s"):
+        waiter.wait({"action": "wait_for_network_idle", "timeout": 2}, 0)
+    with pytest.raises(TimeoutError, match="No response"):
+        waiter.wait({"action": "wait_for_response", "url": "*/never", "timeout": 1}, 1)
@@ -0,0 +1,229 @@
+import time
+from collections import deque
+from fnmatch import fnmatch
+
+
+# Actions handled by the wait engine rather than the main step interpreter
+WAIT_ACTIONS = {
+    "wait",
+    "wait_for_selector",
+    "wait_for_url",
+    "wait_for_network_idle",
+    "wait_for_response",
+}
+
+# Default timeout in seconds for condition waits without an explicit `timeout`
+DEFAULT_TIMEOUT = 30
+
+# How long the network must stay quiet before a page counts as settled
+IDLE_WINDOW = 0.5
+
+# Polling interval in milliseconds; page.wait_for_timeout keeps events flowing
+POLL_MS = 100
+
+
+def pump_until(page, ready):
+    """Call ready() until it returns true, dispatching the page's events in between.
+
+    The sync API only runs event and route handlers while the page's thread
+    is inside a Playwright call, so a plain blocking wait would stall them.
+    """
+    while not ready():
+        page.wait_for_timeout(POLL_MS)
+
+
+def timeout_ms(step):
+    """Return a step's timeout in milliseconds"""
+    return step.get("timeout", DEFAULT_TIMEOUT) * 1000
+
+
+class NetworkMonitor:
+    """Track in-flight requests and recent responses for a page"""
+
+    def __init__(self, page):
+        self.page = page
+        self.inflight = 0
+        self.last_activity = time.monotonic()
+        self.responses = deque(maxlen=500)
+        self._listeners = {
+            "request": self._on_request,
+            "requestfinished": self._on_done,
+            "requestfailed": self._on_done,
+            "response": self._on_response,
+        }
+        for event, handler in self._listeners.items():
+            page.on(event, handler)
+
+    def close(self):
+        """Stop listening; pages outlive a broker run and would collect listeners"""
+        for event, handler in self._listeners.items():
+            self.page.remove_listener(event, handler)
+        self._listeners = {}
+
+    def _on_request(self, request):
+        self.inflight += 1
+        self.last_activity = time.monotonic()
+
+    def _on_done(self, request):
+        self.inflight = max(0, self.inflight - 1)
+        self.last_activity = time.monotonic()
+
+    def _on_response(self, response):
+        self.responses.append((time.monotonic(), response.url, response.status))
+
+    def idle_since(self, start):
+        """True once nothing has been in flight for IDLE_WINDOW after start"""
+        quiet_from = max(start, self.last_activity)
+        return self.inflight == 0 and time.monotonic() - quiet_from >= IDLE_WINDOW
+
+    def find_response(self, pattern, since, status=None):
+        """True if a response matching the URL glob arrived after since"""
+        for seen_at, url, code in self.responses:
+            if seen_at < since or not fnmatch(url, pattern):
+                continue
+            if status is None or code == status:
+                return True
+        return False
+
+
+def _report_migration(name, index, seconds, settled):
+    if settled is None:
+        print(f"[wait-migrate] {name} step {index}: {seconds}s wait, page did not settle")
+    else:
+        print(
+            f"[wait-migrate] {name} step {index}: {seconds}s wait, page settled after {settled:.1f}s"
+        )
+
+
+class StepWaiter:
+    """Condition-based waits for a single page (sync API).
+
+    A legacy `wait` step treats `seconds` as a ceiling and returns as soon as
+    the network has gone quiet. In "migrate" mode the full sleep is kept and
+    the time the page actually needed is printed instead.
+    """
+
+    def __init__(self, page, name, mode="adaptive"):
+        self.page = page
+        self.name = name
+        self.mode = mode
+        self.monitor = NetworkMonitor(page)
+        self.trigger_started = time.monotonic()
+        self.trigger_url = page.url
+
+    def close(self):
+        self.monitor.close()
+
+    def mark(self):
+        """Remember when and where the latest non-wait step started"""
+        self.trigger_started = time.monotonic()
+        self.trigger_url = self.page.url
+
+    def _until(self, predicate, seconds):
+        # Returns the elapsed seconds, or None if the ceiling was reached
+        start = time.monotonic()
+        while True:
+            if predicate():
+                return time.monotonic() - start
+            if time.monotonic() - start >= seconds:
+                return None
+            self.page.wait_for_timeout(POLL_MS)
+
+    def wait(self, step, index):
+        action = step["action"]
+        if action == "wait":
+            self._legacy(step, index)
+        elif action == "wait_for_selector":
+            self.page.wait_for_selector(
+                step["selector"],
+                state=step.get("state", "visible"),
+                timeout=timeout_ms(step),
+            )
+        elif action == "wait_for_url":
+            if "url" in step:
+                self.page.wait_for_url(step["url"], timeout=timeout_ms(step))
+            else:
+                baseline = self.trigger_url
+                self.page.wait_for_url(
+                    lambda url: url != baseline, timeout=timeout_ms(step)
+                )
+        elif action == "wait_for_network_idle":
+            start = time.monotonic()
+            seconds = step.get("timeout", DEFAULT_TIMEOUT)
+            if self._until(lambda: self.monitor.idle_since(start), seconds) is None:
+                raise TimeoutError(f"Network did not go idle within {seconds}s")
+        elif action == "wait_for_response":
+            since = self.trigger_started
+            seconds = step.get("timeout", DEFAULT_TIMEOUT)
+            found = self._until(
+                lambda: self.monitor.find_response(step["url"], since, step.get("status")),
+                seconds,
+            )
+            if found is None:
+                raise TimeoutError(f"No response matching {step['url']} within {seconds}s")
+
+    def _legacy(self, step, index):
+        seconds = step["seconds"]
+        start = time.monotonic()
+        settled = self._until(lambda: self.monitor.idle_since(start), seconds)
+        if self.mode == "migrate":
+            remaining = seconds - (time.monotonic() - start)
+            if remaining > 0:
+                self.page.wait_for_timeout(remaining * 1000)
+            _report_migration(self.name, index, seconds, settled)
+
+
+class AsyncStepWaiter(StepWaiter):
+    """Condition-based waits for a single page (async API)"""
+
+    async def _until(self, predicate, seconds):
+        start = time.monotonic()
+        while True:
+            if predicate():
+                return time.monotonic() - start
+            if time.monotonic() - start >= seconds:
+                return None
+            await self.page.wait_for_timeout(POLL_MS)
+
+    async def wait(self, step, index):
+        action = step["action"]
+        if action == "wait":
+            await self._legacy(step, index)
+        elif action == "wait_for_selector":
+            await self.page.wait_for_selector(
+                step["selector"],
+                state=step.get("state", "visible"),
+                timeout=timeout_ms(step),
+            )
+        elif action == "wait_for_url":
+            if "url" in step:
+                await self.page.wait_for_url(step["url"], timeout=timeout_ms(step))
+            else:
+                baseline = self.trigger_url
+                await self.page.wait_for_url(
+                    lambda url: url != baseline, timeout=timeout_ms(step)
+                )
+        elif action == "wait_for_network_idle":
+            start = time.monotonic()
+            seconds = step.get("timeout", DEFAULT_TIMEOUT)
+            if await self._until(lambda: self.monitor.idle_since(start), seconds) is None:
+                raise TimeoutError(f"Network did not go idle within {seconds}s")
+        elif action == "wait_for_response":
+            since = self.trigger_started
+            seconds = step.get("timeout", DEFAULT_TIMEOUT)
+            found = await self._until(
+                lambda: self.monitor.find_response(step["url"], since, step.get("status")),
+                seconds,
+            )
+            if found is None:
+                raise TimeoutError(f"No response matching {step['url']} within {seconds}s")
+
+    async def _legacy(self, step, index):
+        seconds = step["seconds"]
+        start = time.monotonic()
+        settled = await self._until(lambda: self.monitor.idle_since(start), seconds)
+        if self.mode == "migrate":
+            remaining = seconds - (time.monotonic() - start)
+            if remaining > 0:
+                await self.page.wait_for_timeout(remaining * 1000)
+            _report_migration(self.name, index, seconds, settled)